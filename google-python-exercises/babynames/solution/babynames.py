@@ -6,8 +6,18 @@
 # Google's Python Class
 # http://code.google.com/edu/languages/google-python-class/
 
+import errno
+import glob
+import hashlib
+import itertools
+import marshal
+import multiprocessing
+import os
 import sys
 import re
+import time
+
+import binsummary
 
 """Baby Names exercise
 
@@ -34,12 +44,87 @@ Suggested milestones for incremental development:
  -Fix main() to use the extract_names list
 """
 
-def extract_names(filename):
+# Directory for cached extract_names() results; None turns caching off.
+# Set with the BABYNAMES_CACHE environment variable or --cachedir.
+CACHE_DIR = os.environ.get('BABYNAMES_CACHE') or None
+
+
+def cache_path(filename, cache_dir):
+  """Returns the cache file used for filename inside cache_dir."""
+  key = hashlib.md5(os.path.abspath(filename)).hexdigest()
+  return os.path.join(cache_dir, key + '.names')
+
+
+def file_fingerprint(filename):
+  """Returns (size, mtime) for filename -- changes whenever it is edited."""
+  st = os.stat(filename)
+  return (st.st_size, st.st_mtime)
+
+
+def read_cache(filename, cache_dir):
+  """
+  Returns the cached names list for filename, or None if there is no
+  entry or the file has changed since the entry was written.
+  """
+  try:
+    f = open(cache_path(filename, cache_dir), 'rb')
+    try:
+      fingerprint, names = marshal.load(f)
+    finally:
+      f.close()
+  except (IOError, EOFError, ValueError, TypeError):
+    return None
+  if fingerprint != file_fingerprint(filename):
+    return None
+  return names
+
+
+def write_cache(filename, names, cache_dir, fingerprint):
+  """
+  Stores the names list for filename, replacing any stale entry.
+  fingerprint is file_fingerprint() taken before the file was parsed, so
+  a file edited during the parse is not cached as if it were current.
+  """
+  try:
+    os.makedirs(cache_dir)
+  except OSError, e:
+    # Another --jobs worker may have just made it.
+    if e.errno != errno.EEXIST:
+      raise
+  path = cache_path(filename, cache_dir)
+  # Write to a temp file and rename, so a reader never sees half an entry.
+  tmp_path = '%s.%d.tmp' % (path, os.getpid())
+  f = open(tmp_path, 'wb')
+  marshal.dump((fingerprint, names), f)
+  f.close()
+  os.rename(tmp_path, path)
+
+
+def extract_names(filename, cache_dir=None, engine='regex'):
   """
   Given a file name for baby.html, returns a list starting with the year string
   followed by the name-rank strings in alphabetical order.
   ['2006', 'Aaliyah 91', Aaron 57', 'Abagail 895', ' ...]
+  If cache_dir (or CACHE_DIR) is set, a cached result for an unchanged
+  file is returned without parsing it again.
+  engine picks the parser from ENGINES; they all return the same list.
   """
+  cache_dir = cache_dir or CACHE_DIR
+  if cache_dir:
+    names = read_cache(filename, cache_dir)
+    if names is not None:
+      return names
+    # Taken before parsing; see write_cache().
+    fingerprint = file_fingerprint(filename)
+
+  names = ENGINES[engine](filename)
+  if cache_dir:
+    write_cache(filename, names, cache_dir, fingerprint)
+  return names
+
+
+def regex_names(filename):
+  """The regex engine: extract_names() without the cache."""
   # +++your code here+++
   # LAB(begin solution)
   # The list [year, name_and_rank, name_and_rank, ...] we'll eventually return.
@@ -94,6 +179,227 @@ def extract_names(filename):
   # LAB(end solution)
 
 
+# Characters matched by \w, for checking names without a regex.
+WORD_CHARS = ('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+              '0123456789_')
+
+
+def scan_year(text):
+  """Returns the year from the first 'Popularity in YYYY', or None."""
+  pos = text.find('Popularity')
+  while pos != -1:
+    # Same as Popularity\sin\s(\d\d\d\d)
+    year = text[pos + 14:pos + 18]
+    if (text[pos + 10:pos + 11].isspace() and text[pos + 11:pos + 13] == 'in'
+        and text[pos + 13:pos + 14].isspace() and len(year) == 4
+        and year.isdigit()):
+      return year
+    pos = text.find('Popularity', pos + 10)
+  return None
+
+
+def scan_name_ranks(text, names_to_rank):
+  """
+  Single pass over text with str.find(), adding each row's names to
+  names_to_rank. A name already in the dict keeps its earlier (better)
+  rank. Returns the number of rows seen.
+  Matches the same rows as <td>(\d+)</td><td>(\w+)</td><td>(\w+)</td>.
+  """
+  rows = 0
+  find = text.find  # bound once; this loop runs once per row
+  pos = find('<td>')
+  while pos != -1:
+    rank_start = pos + 4
+    rank_end = find('</td><td>', rank_start)
+    boy_end = find('</td><td>', rank_end + 9)
+    girl_end = find('</td>', boy_end + 9)
+    if rank_end == -1 or boy_end == -1 or girl_end == -1:
+      break
+    rank = text[rank_start:rank_end]
+    boyname = text[rank_end + 9:boy_end]
+    girlname = text[boy_end + 9:girl_end]
+    if (rank.isdigit() and boyname and girlname and
+        not (boyname + girlname).translate(None, WORD_CHARS)):
+      if boyname not in names_to_rank:
+        names_to_rank[boyname] = rank
+      if girlname not in names_to_rank:
+        names_to_rank[girlname] = rank
+      rows += 1
+      pos = find('<td>', girl_end + 5)
+    else:
+      # Not a data row; try the next <td>.
+      pos = find('<td>', rank_start)
+  return rows
+
+
+def scan_names(filename):
+  """The scan engine: one str.find() pass instead of two regexes."""
+  f = open(filename, 'rb')
+  text = f.read()
+  f.close()
+
+  year = scan_year(text)
+  if year is None:
+    sys.stderr.write('Couldn\'t find the year!\n')
+    sys.exit(1)
+
+  names_to_rank = {}
+  scan_name_ranks(text, names_to_rank)
+  names = [year]
+  for name in sorted(names_to_rank):
+    names.append(name + ' ' + names_to_rank[name])
+  return names
+
+
+# Engine name -> function(filename) returning the extract_names() list.
+ENGINES = {
+    'regex': regex_names,
+    'scan': scan_names,
+}
+
+
+# Size of each read() in iter_records(), and the longest stretch of text a
+# single match can span -- anything older than that in the carried-over tail
+# can never become part of a match, so it is safe to drop.
+CHUNK_SIZE = 1 << 16
+MAX_RECORD = 512
+
+# One pattern for both the year header and the data rows, so a single
+# finditer() pass over each chunk sees them in file order.
+RECORD_RE = re.compile(r'Popularity\sin\s(\d\d\d\d)|'
+                       r'<td>(\d+)</td><td>(\w+)</td>\<td>(\w+)</td>')
+
+
+def iter_records(filename, chunk_size=CHUNK_SIZE):
+  """
+  Streams the given baby.html file in fixed-size chunks, yielding one
+  (year, rank, boyname, girlname) tuple per table row as soon as it is seen.
+  Works on concatenated multi-year files: each row is tagged with the
+  most recent 'Popularity in' year before it.
+  Memory use is bounded by chunk_size no matter how big the file is.
+  """
+  year = None
+  tail = ''
+  f = open(filename, 'rU')
+  while True:
+    chunk = f.read(chunk_size)
+    text = tail + chunk
+    end = 0
+    for match in RECORD_RE.finditer(text):
+      if match.group(1):
+        year = match.group(1)
+      else:
+        yield (year, match.group(2), match.group(3), match.group(4))
+      end = match.end()
+    if not chunk:
+      break
+    # Carry over the unmatched tail, which may hold a row split across
+    # the chunk boundary.
+    tail = text[max(end, len(text) - MAX_RECORD):]
+  f.close()
+
+
+def _extract_job(job):
+  """Pool worker: extract_names(), but a file with no year comes back
+  as None rather than exiting the worker process. With skip_errors, so
+  does a file that cannot be read (say, one deleted since it was listed)."""
+  filename, cache_dir, engine, skip_errors = job
+  try:
+    return extract_names(filename, cache_dir, engine)
+  except SystemExit:
+    return None
+  except (IOError, OSError), e:
+    if not skip_errors:
+      raise
+    sys.stderr.write('%s\n' % e)
+    return None
+
+
+def extract_all(filenames, jobs=1, cache_dir=None, engine='regex',
+                skip_errors=False):
+  """
+  Yields (filename, names) for each file, in the order given.
+  With jobs > 1 the files are handed to a pool of that many worker
+  processes; results are still yielded in the original order.
+  A file with no year exits the program, or with skip_errors is
+  yielded with names None, as is a file that cannot be read.
+  """
+  work = [(filename, cache_dir, engine, skip_errors) for filename in filenames]
+  if jobs <= 1 or not filenames:
+    results = itertools.imap(_extract_job, work)
+    pool = None
+  else:
+    pool = multiprocessing.Pool(jobs)
+    results = pool.imap(_extract_job, work)
+  try:
+    for filename, names in itertools.izip(filenames, results):
+      if names is None and not skip_errors:
+        # extract_names() already printed the error.
+        sys.exit(1)
+      yield filename, names
+  finally:
+    if pool:
+      pool.terminate()
+
+
+def write_summary_file(filename, names, binary=False):
+  """Writes names to filename.summary, or filename.summary.bin if binary."""
+  if binary:
+    binsummary.write_summary(filename + '.summary.bin', names)
+  else:
+    outf = open(filename + '.summary', 'w')
+    outf.write('\n'.join(names) + '\n')
+    outf.close()
+
+
+def watch_files(dirname):
+  """Returns {filename: (size, mtime)} for the baby*.html files in dirname."""
+  result = {}
+  for filename in glob.glob(os.path.join(dirname, 'baby*.html')):
+    try:
+      result[filename] = file_fingerprint(filename)
+    except OSError:
+      # Removed between the glob() and the stat().
+      pass
+  return result
+
+
+def watch(dirname, interval=2.0, jobs=1, cache_dir=None, engine='regex',
+          binary=False, archive=None):
+  """
+  Polls dirname forever. Each time a baby*.html file appears or its
+  size or mtime changes, re-extracts just that file and rewrites its
+  summary, and the archive file if one is given. A file that fails
+  (say, one still being written) is retried the next time it changes.
+  """
+  seen = {}
+  latest = {}  # filename -> names, for rewriting the archive
+  while True:
+    current = watch_files(dirname)
+    changed = sorted(filename for filename in current
+                     if seen.get(filename) != current[filename])
+    removed = set(seen) - set(current)
+    for filename, names in extract_all(changed, jobs, cache_dir, engine,
+                                       skip_errors=True):
+      if names is None:
+        print 'skipped', filename
+      else:
+        write_summary_file(filename, names, binary)
+        latest[filename] = names
+        print 'updated', filename
+    if archive and (changed or removed):
+      for filename in removed:
+        latest.pop(filename, None)
+      # Replace the archive in one rename so readers never see half of it.
+      names_lists = [latest[filename] for filename in sorted(latest)]
+      binsummary.write_archive(archive + '.tmp', names_lists)
+      os.rename(archive + '.tmp', archive)
+      print 'updated', archive
+    sys.stdout.flush()
+    seen = current
+    time.sleep(interval)
+
+
 def main():
   # This command-line parsing code is provided.
   # Make a list of command line arguments, omitting the [0] element
@@ -101,31 +407,81 @@ def main():
   args = sys.argv[1:]
 
   if not args:
-    print 'usage: [--summaryfile] file [file ...]'
+    print ('usage: [--summaryfile | --binsummary] [--jobs N] [--cachedir dir] '
+           '[--engine regex|scan] file [file ...]')
+    print ('       --archive file [--jobs N] [--cachedir dir] file [file ...]')
+    print ('       [--binsummary] [--archive file] [--jobs N] '
+           '[--interval secs] --watch dir')
     sys.exit(1)
 
-  # Notice the summary flag and remove it from args if it is present.
+  # Notice the flags and remove them from args if they are present.
   summary = False
-  if args[0] == '--summaryfile':
-    summary = True
-    del args[0]
+  binary = False
+  jobs = 1
+  cache_dir = None
+  engine = 'regex'
+  watch_dir = None
+  interval = 2.0
+  archive = None
+  while args and args[0].startswith('--'):
+    if args[0] == '--summaryfile':
+      summary = True
+      del args[0]
+    elif args[0] == '--binsummary':
+      binary = True
+      del args[0]
+    elif args[0] == '--jobs' and len(args) > 1:
+      jobs = int(args[1])
+      del args[0:2]
+    elif args[0] == '--cachedir' and len(args) > 1:
+      cache_dir = args[1]
+      del args[0:2]
+    elif args[0] == '--engine' and len(args) > 1 and args[1] in ENGINES:
+      engine = args[1]
+      del args[0:2]
+    elif args[0] == '--watch' and len(args) > 1:
+      watch_dir = args[1]
+      del args[0:2]
+    elif args[0] == '--interval' and len(args) > 1:
+      interval = float(args[1])
+      del args[0:2]
+    elif args[0] == '--archive' and len(args) > 1:
+      archive = args[1]
+      del args[0:2]
+    else:
+      print 'unknown option: ' + args[0]
+      sys.exit(1)
 
   # +++your code here+++
   # For each filename, get the names, then either print the text output
   # or write it to a summary file
   # LAB(begin solution)
-  for filename in args:
-    names = extract_names(filename)
+  if watch_dir:
+    # Watch mode always writes summaries; there is no one to print to.
+    watch(watch_dir, interval, jobs, cache_dir, engine, binary, archive)
 
-    # Make text out of the whole list
-    text = '\n'.join(names)
+  if archive:
+    # One file for every year, written as each one is extracted. It goes
+    # to a temp file first, so a file with no year part way through
+    # leaves any old archive alone instead of a truncated one.
+    tmp_archive = archive + '.tmp'
+    try:
+      binsummary.write_archive(tmp_archive, (names for filename, names in
+                                             extract_all(args, jobs, cache_dir,
+                                                         engine)))
+    except:
+      if os.path.exists(tmp_archive):
+        os.remove(tmp_archive)
+      raise
+    os.rename(tmp_archive, archive)
+    return
 
-    if summary:
-      outf = open(filename + '.summary', 'w')
-      outf.write(text + '\n')
-      outf.close()
+  for filename, names in extract_all(args, jobs, cache_dir, engine):
+    if summary or binary:
+      write_summary_file(filename, names, binary)
     else:
-      print text
+      # Make text out of the whole list
+      print '\n'.join(names)
   # LAB(end solution)
 
 if __name__ == '__main__':
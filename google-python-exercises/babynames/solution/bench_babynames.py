@@ -0,0 +1,216 @@
+#!/usr/bin/python -tt
+
+"""Synthetic data generator and benchmark runner for babynames.
+
+Writes baby.html look-alikes with any number of rows -- same header,
+same 'Popularity in YYYY' line, same <tr><td> row markup -- and times
+extract_names() on them stage by stage:
+
+  read    f.read() of the whole file
+  regex   the year search plus the findall() over the rows
+  dict    building the name -> rank dict
+  sort    sorting the names
+  join    building the 'Name 123' strings and the final text
+
+The scan engine (babynames.py --engine scan) does regex + dict in one
+pass, reported as 'scan'.
+
+Peak memory is measured per engine and size; see ../../benchrun.py.
+
+  ./bench_babynames.py [--sizes 10000,1000000,10000000] [--dir dir]
+                       [--engines regex,...]
+"""
+
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import babynames
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..'))
+import benchrun
+
+HEADER = """<head><title>Popular Baby Names</title>
+</head>
+<body bgcolor="#ffffff" text="#000000" topmargin="1" leftmargin="0">
+<h3 align="center">Popularity in %d</h3>
+<p align="center">
+<table width="48%%" border="1" bordercolor="#aaabbb"
+ cellpadding="2" cellspacing="0" summary="Popularity for top %d">
+<tr align="center" valign="bottom">
+  <th scope="col" width="12%%" bgcolor="#efefef">Rank</th>
+  <th scope="col" width="41%%" bgcolor="#99ccff">Male name</th>
+<th scope="col" bgcolor="pink" width="41%%">Female name</th></tr>
+"""
+
+ROW = '<tr align="right"><td>%d</td><td>%s</td><td>%s</td>\n'
+
+FOOTER = """</table></p>
+</body></html>
+"""
+
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def synthetic_name(n):
+  """Returns a distinct capitalized name for every integer n."""
+  letters = []
+  n += 26 * 27  # start at three letters so names look like names
+  while n:
+    n, i = divmod(n, 26)
+    letters.append(LETTERS[i])
+  return ''.join(letters).capitalize()
+
+
+def write_synthetic(filename, rows, year=1990):
+  """Writes a baby.html style file with the given number of rows.
+  Every tenth girl name repeats a boy name, as real years do."""
+  f = open(filename, 'w', 1 << 20)
+  f.write(HEADER % (year, rows))
+  batch = []
+  for rank in xrange(1, rows + 1):
+    boyname = synthetic_name(2 * rank)
+    if rank % 10 == 0:
+      girlname = synthetic_name(rank)
+    else:
+      girlname = synthetic_name(2 * rank + 1)
+    batch.append(ROW % (rank, boyname, girlname))
+    if len(batch) == 10000:
+      f.write(''.join(batch))
+      batch = []
+  f.write(''.join(batch))
+  f.write(FOOTER)
+  f.close()
+
+
+def regex_stages(filename):
+  """The regex extract_names() broken into separately timed stages.
+  Returns (rows, [(stage, seconds), ...])."""
+  times = []
+  start = time.time()
+
+  f = open(filename, 'rU')
+  text = f.read()
+  f.close()
+  now = time.time()
+  times.append(('read', now - start))
+  start = now
+
+  year = re.search(r'Popularity\sin\s(\d\d\d\d)', text).group(1)
+  tuples = re.findall(r'<td>(\d+)</td><td>(\w+)</td>\<td>(\w+)</td>', text)
+  now = time.time()
+  times.append(('regex', now - start))
+  start = now
+
+  names_to_rank = {}
+  for rank, boyname, girlname in tuples:
+    if boyname not in names_to_rank:
+      names_to_rank[boyname] = rank
+    if girlname not in names_to_rank:
+      names_to_rank[girlname] = rank
+  now = time.time()
+  times.append(('dict', now - start))
+  start = now
+
+  sorted_names = sorted(names_to_rank.keys())
+  now = time.time()
+  times.append(('sort', now - start))
+  start = now
+
+  names = [year]
+  for name in sorted_names:
+    names.append(name + ' ' + names_to_rank[name])
+  '\n'.join(names)
+  times.append(('join', time.time() - start))
+  return len(tuples), times
+
+
+def scan_stages(filename):
+  """The str.find() scan engine, timed the same way; the single scan
+  pass that builds the dict is reported as 'scan'."""
+  times = []
+  start = time.time()
+
+  f = open(filename, 'rb')
+  text = f.read()
+  f.close()
+  now = time.time()
+  times.append(('read', now - start))
+  start = now
+
+  year = babynames.scan_year(text)
+  names_to_rank = {}
+  rows = babynames.scan_name_ranks(text, names_to_rank)
+  now = time.time()
+  times.append(('scan', now - start))
+  start = now
+
+  sorted_names = sorted(names_to_rank)
+  now = time.time()
+  times.append(('sort', now - start))
+  start = now
+
+  names = [year]
+  for name in sorted_names:
+    names.append(name + ' ' + names_to_rank[name])
+  '\n'.join(names)
+  times.append(('join', time.time() - start))
+  return rows, times
+
+
+# Engine name -> function(filename) returning (rows, stage times).
+ENGINES = {
+    'regex': regex_stages,
+    'scan': scan_stages,
+}
+
+
+def main():
+  args = sys.argv[1:]
+  sizes = [10000, 1000000]
+  dirname = None
+  engines = sorted(ENGINES)
+  while args:
+    if args[0] == '--sizes' and len(args) > 1:
+      sizes = [int(size) for size in args[1].split(',')]
+      del args[0:2]
+    elif args[0] == '--dir' and len(args) > 1:
+      dirname = args[1]
+      del args[0:2]
+    elif args[0] == '--engines' and len(args) > 1:
+      engines = args[1].split(',')
+      del args[0:2]
+    else:
+      print ('usage: ./bench_babynames.py [--sizes n,n,...] [--dir dir] '
+             '[--engines name,...]')
+      sys.exit(1)
+
+  temp_dir = None
+  if dirname is None:
+    dirname = temp_dir = tempfile.mkdtemp(prefix='babynames-bench-')
+  elif not os.path.exists(dirname):
+    os.makedirs(dirname)
+
+  try:
+    for size in sizes:
+      filename = os.path.join(dirname, 'synthetic%d.html' % size)
+      # Generated files are kept and reused when --dir is given.
+      if not os.path.exists(filename):
+        write_synthetic(filename, size)
+      for engine in engines:
+        (rows, times), peak_kb = benchrun.run_isolated(
+            ENGINES[engine], [filename])
+        total = sum(seconds for stage, seconds in times)
+        print '%-6s %9d rows %8.3fs %12.0f rows/s  peak %7.1f MB' % (
+            engine, rows, total, rows / max(total, 1e-9), peak_kb / 1024.0)
+        print '       ' + '  '.join('%s %.3fs' % stage for stage in times)
+  finally:
+    if temp_dir:
+      shutil.rmtree(temp_dir)
+
+if __name__ == '__main__':
+  main()
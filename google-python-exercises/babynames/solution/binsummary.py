@@ -0,0 +1,234 @@
+#!/usr/bin/python -tt
+
+"""Binary, memory-mappable version of the babynames .summary files.
+
+Layout (all integers little-endian):
+
+  header   '<4sHHII'  magic 'BNS1', version, year, name count N,
+                      size of the name blob in bytes
+  offsets  N+1 uint32 start of each name in the blob (the last is the end)
+  ranks    N uint16   rank of each name
+  blob     the names, sorted, back to back with no separators
+
+Names are sorted in the same order as the text summary, so a reader can
+mmap the file and binary-search the offsets table, touching only the
+pages it needs instead of reading and splitting the whole thing.
+
+An archive packs many years into one file, so writing a whole batch is a
+single open and a run of large buffered writes:
+
+  data     the year summaries above, back to back
+  table    Y x '<HQQ' year, offset and length of each year's summary
+  trailer  '<4sHIQ'   magic 'BNA1', version, number of years Y,
+                      offset of the table
+
+The table goes at the end so years can be streamed out as they are
+extracted. A reader seeks to the trailer, loads the table and then maps
+just the year it wants.
+"""
+
+import array
+import mmap
+import struct
+import sys
+
+MAGIC = 'BNS1'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII')
+
+ARCHIVE_MAGIC = 'BNA1'
+ARCHIVE_TRAILER = struct.Struct('<4sHIQ')
+ARCHIVE_ENTRY = struct.Struct('<HQQ')
+
+# Buffer size for archive writes.
+WRITE_BUFFER = 1 << 20
+
+
+def summary_bytes(names):
+  """
+  Returns the binary summary for a names list as returned by
+  extract_names(): ['2006', 'Aaliyah 91', 'Aaron 57', ...]
+  """
+  year = int(names[0])
+  offsets = array.array('I', [0])
+  ranks = array.array('H')
+  blob = []
+  pos = 0
+  for name_rank in names[1:]:
+    name, rank = name_rank.split()
+    blob.append(name)
+    pos += len(name)
+    offsets.append(pos)
+    ranks.append(int(rank))
+  if sys.byteorder != 'little':
+    offsets.byteswap()
+    ranks.byteswap()
+
+  return ''.join([HEADER.pack(MAGIC, VERSION, year, len(ranks), pos),
+                  offsets.tostring(), ranks.tostring()] + blob)
+
+
+def write_summary(filename, names):
+  """Writes the binary summary for a names list to filename."""
+  f = open(filename, 'wb')
+  f.write(summary_bytes(names))
+  f.close()
+
+
+def write_archive(filename, names_lists):
+  """
+  Writes one archive holding a binary summary per names list.
+  names_lists may be any iterable, e.g. extract_all() output, so each
+  year is written as soon as it is ready.
+  """
+  f = open(filename, 'wb', WRITE_BUFFER)
+  entries = []
+  pos = 0
+  for names in names_lists:
+    data = summary_bytes(names)
+    f.write(data)
+    entries.append(ARCHIVE_ENTRY.pack(int(names[0]), pos, len(data)))
+    pos += len(data)
+  f.write(''.join(entries))
+  f.write(ARCHIVE_TRAILER.pack(ARCHIVE_MAGIC, VERSION, len(entries), pos))
+  f.close()
+
+
+def convert_text_summary(text_filename, filename=None):
+  """Converts an existing text .summary file to the binary format.
+  Returns the name of the file written (text_filename + '.bin' by default)."""
+  if filename is None:
+    filename = text_filename + '.bin'
+  f = open(text_filename, 'rU')
+  names = f.read().split('\n')
+  f.close()
+  write_summary(filename, [line for line in names if line])
+  return filename
+
+
+def map_file(filename):
+  """Returns a read-only mmap of the whole file."""
+  f = open(filename, 'rb')
+  try:
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+  finally:
+    f.close()
+
+
+class BinarySummary(object):
+  """
+  Read-only, mmap-backed view of one binary summary: either a whole
+  .summary.bin file, or one year inside an archive's mmap (mm) starting
+  at byte base.
+  """
+
+  def __init__(self, filename=None, mm=None, base=0):
+    self.owns_mm = mm is None
+    if mm is None:
+      mm = map_file(filename)
+    self.mm = mm
+    magic, version, self.year, self.count, blob_size = HEADER.unpack_from(
+        self.mm, base)
+    if magic != MAGIC or version != VERSION:
+      raise ValueError('%s is not a binary summary file' % filename)
+    self.offsets_at = base + HEADER.size
+    self.ranks_at = self.offsets_at + 4 * (self.count + 1)
+    self.blob_at = self.ranks_at + 2 * self.count
+
+  def close(self):
+    if self.owns_mm:
+      self.mm.close()
+
+  def __len__(self):
+    return self.count
+
+  def name(self, i):
+    """Returns the i-th name in sorted order."""
+    start, end = struct.unpack_from('<II', self.mm, self.offsets_at + 4 * i)
+    return self.mm[self.blob_at + start:self.blob_at + end]
+
+  def rank_at(self, i):
+    """Returns the rank of the i-th name."""
+    return struct.unpack_from('<H', self.mm, self.ranks_at + 2 * i)[0]
+
+  def rank(self, name):
+    """Binary-searches for name; returns its rank or None."""
+    lo = 0
+    hi = self.count
+    while lo < hi:
+      mid = (lo + hi) // 2
+      if self.name(mid) < name:
+        lo = mid + 1
+      else:
+        hi = mid
+    if lo < self.count and self.name(lo) == name:
+      return self.rank_at(lo)
+    return None
+
+  def names(self):
+    """Returns the same list extract_names() would, read back from the file."""
+    result = [str(self.year)]
+    for i in range(self.count):
+      result.append('%s %d' % (self.name(i), self.rank_at(i)))
+    return result
+
+
+class SummaryArchive(object):
+  """Reader for an archive written by write_archive()."""
+
+  def __init__(self, filename):
+    f = open(filename, 'rb')
+    try:
+      f.seek(-ARCHIVE_TRAILER.size, 2)
+      magic, version, count, table_at = ARCHIVE_TRAILER.unpack(
+          f.read(ARCHIVE_TRAILER.size))
+      if magic != ARCHIVE_MAGIC or version != VERSION:
+        raise ValueError('%s is not a summary archive' % filename)
+      f.seek(table_at)
+      table = f.read(count * ARCHIVE_ENTRY.size)
+    finally:
+      f.close()
+    self.offsets = {}  # year -> offset of its summary
+    for i in range(count):
+      year, offset, unused_length = ARCHIVE_ENTRY.unpack_from(
+          table, i * ARCHIVE_ENTRY.size)
+      self.offsets[year] = offset
+    self.mm = map_file(filename)
+
+  def close(self):
+    self.mm.close()
+
+  def years(self):
+    return sorted(self.offsets)
+
+  def summary(self, year):
+    """Returns a BinarySummary for one year, reading nothing else."""
+    return BinarySummary(mm=self.mm, base=self.offsets[int(year)])
+
+  def names(self, year):
+    """Returns the extract_names() list for one year."""
+    return self.summary(year).names()
+
+
+def main():
+  args = sys.argv[1:]
+  if len(args) >= 2 and args[0] == '--convert':
+    for filename in args[1:]:
+      print convert_text_summary(filename)
+  elif len(args) >= 3 and args[0] == '--lookup':
+    name = args[1]
+    for filename in args[2:]:
+      summary = BinarySummary(filename)
+      print summary.year, name, summary.rank(name)
+      summary.close()
+  elif len(args) == 3 and args[0] == '--year':
+    archive = SummaryArchive(args[2])
+    print '\n'.join(archive.names(args[1]))
+    archive.close()
+  else:
+    print 'usage: ./binsummary.py {--convert file.summary [...] |',
+    print '--lookup name file.summary.bin [...] | --year year archive}'
+    sys.exit(1)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,106 @@
+#!/usr/bin/python -tt
+
+"""Prefix and fuzzy (edit distance 1) name lookups over a NameStore.
+
+The index is built once over every loaded year and then reused:
+
+ -prefix search bisects a sorted array of lowercased names, so 'jes'
+  costs two binary searches plus the size of the answer
+ -fuzzy search uses a deletion index: every name is filed under each
+  string obtained by deleting one of its letters (and under itself).
+  Any two strings within one edit share an entry, so a query only has
+  to look up its own len+1 deletions and check the few candidates.
+"""
+
+import bisect
+import sys
+
+import namestore
+
+
+def within_one_edit(a, b):
+  """Returns True if a and b differ by at most one insert/delete/replace."""
+  if a == b:
+    return True
+  if abs(len(a) - len(b)) > 1:
+    return False
+  if len(a) > len(b):
+    a, b = b, a
+  # Skip the common prefix, then the rest must match after one edit.
+  i = 0
+  while i < len(a) and a[i] == b[i]:
+    i += 1
+  if len(a) == len(b):
+    return a[i + 1:] == b[i + 1:]
+  return a[i:] == b[i + 1:]
+
+
+def deletions(word):
+  """Returns word and every string made by deleting one of its letters."""
+  return set([word] + [word[:i] + word[i + 1:] for i in range(len(word))])
+
+
+class NameIndex(object):
+  """Sorted name array with best ranks, a lowercased copy sorted for
+  prefix search, and a deletion index. Both searches ignore case."""
+
+  def __init__(self, store):
+    best = {}
+    for year in store.years:
+      for name_id, rank in enumerate(store.columns[year]):
+        if rank and (name_id not in best or rank < best[name_id]):
+          best[name_id] = rank
+    pairs = sorted((store.names[name_id], rank)
+                   for name_id, rank in best.items())
+    self.names = [name for name, rank in pairs]
+    self.best = [rank for name, rank in pairs]
+    # by_lower[j] is the index of the j-th name in lowercase order.
+    self.by_lower = sorted(range(len(self.names)),
+                           key=lambda i: self.names[i].lower())
+    self.lowered = [self.names[i].lower() for i in self.by_lower]
+
+    self.deletes = {}
+    for i, name in enumerate(self.names):
+      for key in deletions(name.lower()):
+        self.deletes.setdefault(key, []).append(i)
+
+  def prefix(self, prefix):
+    """Returns [(name, best rank), ...] for names starting with prefix
+    (ignoring case), in alphabetical order."""
+    prefix = prefix.lower()
+    lo = bisect.bisect_left(self.lowered, prefix)
+    # Every name with the prefix sorts before prefix + the highest char.
+    hi = bisect.bisect_left(self.lowered, prefix + '\xff', lo)
+    return [(self.names[i], self.best[i]) for i in self.by_lower[lo:hi]]
+
+  def fuzzy(self, name, limit=None):
+    """Returns [(name, best rank), ...] for names within one edit of name
+    (ignoring case), best rank first, at most limit of them."""
+    query = name.lower()
+    found = set()
+    for key in deletions(query):
+      for i in self.deletes.get(key, ()):
+        if i not in found and within_one_edit(query, self.names[i].lower()):
+          found.add(i)
+    result = sorted((self.best[i], self.names[i]) for i in found)
+    if limit is not None:
+      result = result[:limit]
+    return [(found_name, rank) for rank, found_name in result]
+
+
+def main():
+  args = sys.argv[1:]
+  if len(args) < 3 or args[0] not in ('--prefix', '--fuzzy'):
+    print 'usage: ./nameindex.py {--prefix | --fuzzy} name file [file ...]'
+    sys.exit(1)
+
+  index = NameIndex(namestore.load_store(args[2:]))
+  if args[0] == '--prefix':
+    matches = index.prefix(args[1])
+  else:
+    matches = index.fuzzy(args[1])
+  for name, rank in matches:
+    print name, rank
+
+if __name__ == '__main__':
+  main()
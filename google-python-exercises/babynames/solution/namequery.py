@@ -0,0 +1,125 @@
+#!/usr/bin/python -tt
+
+"""Cross-year queries over a NameStore.
+
+Answers "rank of a name in every year", "biggest risers/fallers between
+two years" and "names that entered or left the top N" straight from the
+per-year rank arrays, without going back to the HTML.
+
+Each year's column is padded once to the full name count, so the rank
+matrix is a set of equal-length array('H') columns and every query is a
+single zip over two of them (0 still means "not ranked").
+"""
+
+import array
+import heapq
+import itertools
+import sys
+
+import namestore
+
+
+class RankQuery(object):
+  """Query layer over the rank matrix of a NameStore."""
+
+  def __init__(self, store):
+    self.store = store
+    self.years = list(store.years)
+    size = len(store.names)
+    self.matrix = {}
+    for year in self.years:
+      column = array.array('H', store.columns[year])
+      column.extend(array.array('H', [0]) * (size - len(column)))
+      self.matrix[year] = column
+
+  def trajectory(self, name):
+    """Returns [(year, rank), ...] for every loaded year; rank is None
+    where the name is not ranked."""
+    name_id = self.store.ids.get(name)
+    if name_id is None:
+      return [(year, None) for year in self.years]
+    return [(year, self.matrix[year][name_id] or None) for year in self.years]
+
+  def deltas(self, year_a, year_b):
+    """Yields (rank change, name_id) for names ranked in both years.
+    A positive change means the name moved up (to a smaller rank)."""
+    column_a = self.matrix[int(year_a)]
+    column_b = self.matrix[int(year_b)]
+    for name_id, (rank_a, rank_b) in enumerate(
+        itertools.izip(column_a, column_b)):
+      if rank_a and rank_b:
+        yield (rank_a - rank_b, name_id)
+
+  def movers(self, year_a, year_b, k=10):
+    """Returns (risers, fallers) between the two years, each a list of up
+    to k (name, rank_a, rank_b) tuples, biggest move first. Names whose
+    rank did not change are in neither list."""
+    deltas = list(self.deltas(year_a, year_b))
+    risers = heapq.nlargest(k, (delta for delta in deltas if delta[0] > 0))
+    fallers = heapq.nsmallest(k, (delta for delta in deltas if delta[0] < 0))
+    return (self._named(risers, year_a, year_b),
+            self._named(fallers, year_a, year_b))
+
+  def entered(self, year_a, year_b, top=1000):
+    """Returns the sorted names in the top `top` in year_b but not year_a."""
+    return self._crossed(int(year_b), int(year_a), top)
+
+  def left(self, year_a, year_b, top=1000):
+    """Returns the sorted names in the top `top` in year_a but not year_b."""
+    return self._crossed(int(year_a), int(year_b), top)
+
+  def _crossed(self, year_in, year_out, top):
+    """Names ranked within top in year_in but unranked or below it in year_out."""
+    column_in = self.matrix[year_in]
+    column_out = self.matrix[year_out]
+    names = self.store.names
+    return sorted(
+        names[name_id] for name_id, (rank_in, rank_out) in enumerate(
+            itertools.izip(column_in, column_out))
+        if rank_in and rank_in <= top and (not rank_out or rank_out > top))
+
+  def _named(self, deltas, year_a, year_b):
+    column_a = self.matrix[int(year_a)]
+    column_b = self.matrix[int(year_b)]
+    return [(self.store.names[name_id], column_a[name_id], column_b[name_id])
+            for unused_delta, name_id in deltas]
+
+
+def main():
+  args = sys.argv[1:]
+  usage = ('usage: ./namequery.py {--trajectory name | --movers yearA yearB |'
+           ' --entered yearA yearB | --left yearA yearB} file [file ...]')
+  if len(args) < 3:
+    print usage
+    sys.exit(1)
+
+  option = args[0]
+  if option == '--trajectory':
+    params = args[1:2]
+    filenames = args[2:]
+  elif option in ('--movers', '--entered', '--left') and len(args) > 3:
+    params = args[1:3]
+    filenames = args[3:]
+  else:
+    print usage
+    sys.exit(1)
+
+  query = RankQuery(namestore.load_store(filenames))
+  if option == '--trajectory':
+    for year, rank in query.trajectory(params[0]):
+      print year, rank or '-'
+  elif option == '--movers':
+    risers, fallers = query.movers(params[0], params[1])
+    print 'risers:'
+    for name, rank_a, rank_b in risers:
+      print name, rank_a, rank_b
+    print 'fallers:'
+    for name, rank_a, rank_b in fallers:
+      print name, rank_a, rank_b
+  elif option == '--entered':
+    print '\n'.join(query.entered(params[0], params[1]))
+  else:
+    print '\n'.join(query.left(params[0], params[1]))
+
+if __name__ == '__main__':
+  main()
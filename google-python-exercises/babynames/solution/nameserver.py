@@ -0,0 +1,146 @@
+#!/usr/bin/python -tt
+
+"""Local HTTP/JSON server for baby name ranks.
+
+Loads every given year once at startup and answers from memory:
+
+  /rank?name=Emma&year=2008     {"name": "Emma", "year": 2008, "rank": 1}
+  /trajectory?name=Emma         {"name": "Emma", "ranks": [[1990, 130], ...]}
+  /top?year=2008&k=10           {"year": 2008, "names": [["Emma", 1], ...]}
+  /stats                        request count and latency percentiles
+
+Responses are cached by URL, since the data never changes while the server
+is up. Every request is a dict lookup or two, so a plain single-threaded
+BaseHTTPServer keeps up without any locking.
+
+  ./nameserver.py [--port 8000] file [file ...]
+"""
+
+import BaseHTTPServer
+import collections
+import json
+import sys
+import time
+import urlparse
+
+import namequery
+import namestore
+
+# Bounds on the response cache and the latency sample window.
+MAX_CACHED = 10000
+LATENCY_SAMPLES = 10000
+
+
+class NameService(object):
+  """The query side of the server, kept apart from the HTTP plumbing."""
+
+  def __init__(self, store):
+    self.store = store
+    self.query = namequery.RankQuery(store)
+    self.top_lists = {}  # year -> [(name, rank), ...] in rank order
+    self.cache = {}
+    self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+    self.requests = 0
+
+  def rank(self, params):
+    name = params['name']
+    year = int(params['year'])
+    return {'name': name, 'year': year, 'rank': self.store.rank(name, year)}
+
+  def trajectory(self, params):
+    name = params['name']
+    return {'name': name, 'ranks': self.query.trajectory(name)}
+
+  def top(self, params):
+    year = int(params['year'])
+    k = int(params.get('k', 10))
+    if k <= 0:
+      raise ValueError('k must be positive, not %d' % k)
+    if year not in self.top_lists:
+      ranks = self.store.year_ranks(year)
+      self.top_lists[year] = sorted(ranks.items(),
+                                    key=lambda item: (item[1], item[0]))
+    return {'year': year, 'names': self.top_lists[year][:k]}
+
+  def stats(self, unused_params):
+    samples = sorted(self.latencies)
+    result = {'requests': self.requests, 'cached': len(self.cache)}
+    for percentile in (50, 90, 99):
+      if samples:
+        index = min(len(samples) - 1, len(samples) * percentile // 100)
+        result['p%d_ms' % percentile] = samples[index] * 1000.0
+    return result
+
+  def handle(self, path):
+    """Returns (status, JSON text) for a request path such as /rank?..."""
+    url = urlparse.urlparse(path)
+    handlers = {
+        '/rank': self.rank,
+        '/trajectory': self.trajectory,
+        '/top': self.top,
+        '/stats': self.stats,
+    }
+    handler = handlers.get(url.path)
+    if handler is None:
+      return 404, json.dumps({'error': 'unknown path ' + url.path})
+    if handler != self.stats and path in self.cache:
+      return 200, self.cache[path]
+
+    params = dict(urlparse.parse_qsl(url.query))
+    try:
+      body = json.dumps(handler(params))
+    except (KeyError, ValueError), e:
+      return 400, json.dumps({'error': 'bad or missing parameter: %s' % e})
+    if handler != self.stats:
+      if len(self.cache) >= MAX_CACHED:
+        self.cache.clear()
+      self.cache[path] = body
+    return 200, body
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+  def do_GET(self):
+    service = self.server.service
+    start = time.time()
+    status, body = service.handle(self.path)
+    self.send_response(status)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+    service.requests += 1
+    service.latencies.append(time.time() - start)
+
+  def log_message(self, format, *args):
+    # Per-request logging to stderr would cost more than the lookups.
+    pass
+
+
+def make_server(filenames, port=8000, host='127.0.0.1'):
+  """Loads the files and returns an HTTPServer ready to serve_forever()."""
+  server = BaseHTTPServer.HTTPServer((host, port), Handler)
+  server.service = NameService(namestore.load_store(filenames))
+  return server
+
+
+def main():
+  args = sys.argv[1:]
+  port = 8000
+  if len(args) > 1 and args[0] == '--port':
+    port = int(args[1])
+    del args[0:2]
+  if not args:
+    print 'usage: ./nameserver.py [--port N] file [file ...]'
+    sys.exit(1)
+
+  server = make_server(args, port)
+  print 'serving %d years on http://127.0.0.1:%d/' % (
+      len(server.service.store.years), port)
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+
+if __name__ == '__main__':
+  main()
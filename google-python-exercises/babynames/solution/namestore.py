@@ -0,0 +1,104 @@
+#!/usr/bin/python -tt
+
+"""Compact multi-year store for the baby names data.
+
+Rather than one 'Name 123' string per name per year, every name is stored
+once and given an integer id, and each year keeps a typed array of ranks
+indexed by that id (0 means the name is not ranked that year).
+All ten baby*.html years fit in well under a megabyte this way, and
+rank(name, year) is a dict lookup plus an array index.
+"""
+
+import array
+import bisect
+import sys
+
+import babynames
+
+
+class NameStore(object):
+  """Interned names plus one array('H') rank column per year."""
+
+  def __init__(self):
+    self.names = []      # id -> name
+    self.ids = {}        # name -> id
+    self.years = []      # sorted list of int years
+    self.columns = {}    # year -> array('H') of ranks, indexed by name id
+
+  def name_id(self, name):
+    """Returns the id for name, assigning the next free one if it is new."""
+    name_id = self.ids.get(name)
+    if name_id is None:
+      name_id = len(self.names)
+      name = intern(name)
+      self.names.append(name)
+      self.ids[name] = name_id
+    return name_id
+
+  def column(self, year):
+    """Returns the rank array for year, creating it if needed."""
+    column = self.columns.get(year)
+    if column is None:
+      column = array.array('H')
+      self.columns[year] = column
+      bisect.insort(self.years, year)
+    return column
+
+  def add(self, year, rank, name):
+    """Records name at rank in year, unless it already has a (better) rank."""
+    name_id = self.name_id(name)
+    column = self.column(year)
+    if name_id >= len(column):
+      column.extend(array.array('H', [0]) * (name_id + 1 - len(column)))
+    if not column[name_id]:
+      column[name_id] = rank
+
+  def load(self, filename):
+    """Adds every year found in the given baby.html file."""
+    for year, rank, boyname, girlname in babynames.iter_records(filename):
+      year = int(year)
+      rank = int(rank)
+      self.add(year, rank, boyname)
+      self.add(year, rank, girlname)
+
+  def rank(self, name, year):
+    """Returns the rank of name in year, or None if it is not ranked."""
+    name_id = self.ids.get(name)
+    column = self.columns.get(int(year))
+    if name_id is None or column is None or name_id >= len(column):
+      return None
+    return column[name_id] or None
+
+  def year_ranks(self, year):
+    """Returns the name -> rank dict for one year."""
+    column = self.columns[int(year)]
+    return dict((self.names[i], rank) for i, rank in enumerate(column) if rank)
+
+  def nbytes(self):
+    """Approximate size of the rank columns in bytes."""
+    return sum(len(c) * c.itemsize for c in self.columns.values())
+
+
+def load_store(filenames):
+  """Returns a NameStore holding every year in the given files."""
+  store = NameStore()
+  for filename in filenames:
+    store.load(filename)
+  return store
+
+
+def main():
+  args = sys.argv[1:]
+  if len(args) < 3:
+    print 'usage: ./namestore.py name year file [file ...]'
+    sys.exit(1)
+
+  name = args[0]
+  year = args[1]
+  store = load_store(args[2:])
+  print '%s %s %s' % (name, year, store.rank(name, year))
+  print '%d names, %d years, %d bytes of ranks' % (
+      len(store.names), len(store.years), store.nbytes())
+
+if __name__ == '__main__':
+  main()
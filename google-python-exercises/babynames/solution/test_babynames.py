@@ -0,0 +1,151 @@
+#!/usr/bin/python -tt
+
+import glob
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+import babynames
+
+BABY_FILES = sorted(glob.glob(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'baby*.html')))
+
+HEADER = '<h3 align="center">Popularity in 1990</h3>\n'
+ROW = '<tr align="right"><td>%s</td><td>%s</td><td>%s</td>\n'
+EXTRA_ROW = ROW % (1001, 'Zzyzx', 'Zzyzy')
+
+
+def read_text(filename):
+  f = open(filename, 'rU')
+  text = f.read()
+  f.close()
+  return text
+
+
+class TestBabynames(unittest.TestCase):
+
+  def setUp(self):
+    self.dirname = tempfile.mkdtemp()
+    self.cache_dir = os.path.join(self.dirname, 'cache')
+    self.filename = os.path.join(self.dirname, 'baby1990.html')
+    shutil.copy(BABY_FILES[0], self.filename)
+    self.engines = babynames.ENGINES
+    self.parses = []
+
+  def tearDown(self):
+    babynames.ENGINES = self.engines
+    shutil.rmtree(self.dirname)
+
+  def write(self, name, text):
+    filename = os.path.join(self.dirname, name)
+    f = open(filename, 'w')
+    f.write(text)
+    f.close()
+    return filename
+
+  def counting_engine(self, filename):
+    """regex_names(), recording each call in self.parses."""
+    self.parses.append(filename)
+    return babynames.regex_names(filename)
+
+  def extract_counted(self):
+    babynames.ENGINES = {'regex': self.counting_engine}
+    return babynames.extract_names(self.filename, self.cache_dir)
+
+  def append(self, text):
+    f = open(self.filename, 'a')
+    f.write(text)
+    f.close()
+
+  def test_iter_records_matches_findall(self):
+    text = ''.join(read_text(filename) for filename in BABY_FILES)
+    expected = []
+    for part in text.split('Popularity in ')[1:]:
+      year = part[:4]
+      for row in re.findall(r'<td>(\d+)</td><td>(\w+)</td>\<td>(\w+)</td>',
+                            part):
+        expected.append((year,) + row)
+    filename = self.write('all.html', text)
+    self.assertEqual(1000 * len(BABY_FILES), len(expected))
+    for chunk_size in (7, 100, 513, babynames.CHUNK_SIZE):
+      self.assertEqual(expected,
+                       list(babynames.iter_records(filename, chunk_size)))
+
+  def test_cache_hit(self):
+    names = self.extract_counted()
+    self.assertEqual(names, self.extract_counted())
+    self.assertEqual(1, len(self.parses))
+    self.assertEqual(babynames.regex_names(self.filename), names)
+
+  def test_cache_miss_after_edit(self):
+    names = self.extract_counted()
+    self.append(EXTRA_ROW)
+    edited = self.extract_counted()
+    self.assertEqual(2, len(self.parses))
+    self.assertEqual(names + ['Zzyzx 1001', 'Zzyzy 1001'], edited)
+    # Only the mtime changes: parsed again, same result.
+    os.utime(self.filename, (1000000000, 1000000000))
+    self.assertEqual(edited, self.extract_counted())
+    self.assertEqual(3, len(self.parses))
+
+  def test_corrupt_cache_entry(self):
+    names = self.extract_counted()
+    path = babynames.cache_path(self.filename, self.cache_dir)
+    for junk in ('', 'not marshal data', '\x00' * 7):
+      f = open(path, 'wb')
+      f.write(junk)
+      f.close()
+      self.assertEqual(names, self.extract_counted())
+    self.assertEqual(4, len(self.parses))
+    # The bad entry was replaced by a good one.
+    self.assertEqual(names, self.extract_counted())
+    self.assertEqual(4, len(self.parses))
+
+  def test_edit_during_parse_not_cached(self):
+
+    def parse_then_edit(filename):
+      names = babynames.regex_names(filename)
+      self.append(EXTRA_ROW)
+      return names
+
+    babynames.ENGINES = {'regex': parse_then_edit}
+    stale = babynames.extract_names(self.filename, self.cache_dir)
+    self.assertFalse('Zzyzx 1001' in stale)
+    # The entry carries the fingerprint from before the edit, so it
+    # must not be served for the edited file.
+    self.assertTrue('Zzyzx 1001' in self.extract_counted())
+    self.assertEqual(1, len(self.parses))
+
+  def test_scan_same_as_regex(self):
+    for filename in BABY_FILES:
+      self.assertEqual(babynames.regex_names(filename),
+                       babynames.scan_names(filename))
+
+  def test_scan_same_as_regex_edge_cases(self):
+    good = ROW % (1, 'Ann', 'Bea')
+    cases = [
+        # A bare <td> with no row after it, before and after the rows.
+        '<td>\n' + good + '<td>',
+        good + '<table><td>7</td></table>\n<td>',
+        # Ranks that are not all digits.
+        ROW % ('x2', 'Cal', 'Dee') + ROW % ('', 'Eve', 'Fay') + good,
+        ROW % ('3 ', 'Gus', 'Hal') + good,
+        # A </td> inside a name.
+        ROW % (2, 'Ann</td>e', 'Bea') + good,
+        ROW % (2, 'Cal', 'Dee</td>x') + good,
+        ROW % (2, 'Cal', 'Dee</td><td>x') + good,
+        # Short rows, and \w names that are not letters.
+        '<td>4</td><td>Ivy</td>\n' + ROW % (5, 'J_2', '0') + good,
+        '<tr><td>6</td><td>Kay</td><td>7</td><td>Lee</td><td>Max</td>\n',
+    ]
+    for i, rows in enumerate(cases):
+      filename = self.write('edge%d.html' % i, HEADER + rows)
+      expected = babynames.regex_names(filename)
+      self.assertEqual(expected, babynames.scan_names(filename), rows)
+      self.assertTrue(len(expected) > 1, rows)
+
+
+if __name__ == '__main__':
+  unittest.main()
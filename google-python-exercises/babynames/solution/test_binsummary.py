@@ -0,0 +1,110 @@
+#!/usr/bin/python -tt
+
+import cStringIO
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import babynames
+import binsummary
+
+BABY_FILES = sorted(glob.glob(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'baby*.html')))
+
+
+class TestBinSummary(unittest.TestCase):
+
+  def setUp(self):
+    self.dirname = tempfile.mkdtemp()
+    self.names = babynames.extract_names(BABY_FILES[0])
+
+  def tearDown(self):
+    shutil.rmtree(self.dirname)
+
+  def test_round_trip(self):
+    filename = os.path.join(self.dirname, 'year.summary.bin')
+    binsummary.write_summary(filename, self.names)
+    summary = binsummary.BinarySummary(filename)
+    try:
+      self.assertEqual(self.names, summary.names())
+      self.assertEqual(int(self.names[0]), summary.year)
+      self.assertEqual(len(self.names) - 1, len(summary))
+    finally:
+      summary.close()
+
+  def test_rank_lookup(self):
+    filename = os.path.join(self.dirname, 'year.summary.bin')
+    binsummary.write_summary(filename, self.names)
+    summary = binsummary.BinarySummary(filename)
+    try:
+      for name_rank in self.names[1:]:
+        name, rank = name_rank.split()
+        self.assertEqual(int(rank), summary.rank(name))
+      # Before the first name, after the last, and in between.
+      for name in ('A', 'Zzzzz', self.names[1].split()[0] + 'x'):
+        self.assertEqual(None, summary.rank(name))
+    finally:
+      summary.close()
+
+  def test_convert_text_summary(self):
+    text_filename = os.path.join(self.dirname, 'year.summary')
+    f = open(text_filename, 'w')
+    f.write('\n'.join(self.names) + '\n')
+    f.close()
+    summary = binsummary.BinarySummary(
+        binsummary.convert_text_summary(text_filename))
+    try:
+      self.assertEqual(self.names, summary.names())
+    finally:
+      summary.close()
+
+  def test_not_a_summary(self):
+    filename = os.path.join(self.dirname, 'junk')
+    f = open(filename, 'wb')
+    f.write('x' * 100)
+    f.close()
+    self.assertRaises(ValueError, binsummary.BinarySummary, filename)
+
+  def test_archive_round_trip(self):
+    filename = os.path.join(self.dirname, 'all.bna')
+    names_lists = [babynames.extract_names(baby) for baby in BABY_FILES]
+    binsummary.write_archive(filename, iter(names_lists))
+    archive = binsummary.SummaryArchive(filename)
+    try:
+      self.assertEqual(sorted(int(names[0]) for names in names_lists),
+                       archive.years())
+      for names in names_lists:
+        self.assertEqual(names, archive.names(names[0]))
+    finally:
+      archive.close()
+
+  def test_failed_archive_keeps_old_one(self):
+    filename = os.path.join(self.dirname, 'all.bna')
+    binsummary.write_archive(filename, [self.names])
+    no_year = os.path.join(self.dirname, 'baby.html')
+    f = open(no_year, 'w')
+    f.write('<html>no year here</html>\n')
+    f.close()
+
+    argv = sys.argv
+    stderr = sys.stderr
+    sys.argv = ['babynames.py', '--archive', filename, BABY_FILES[-1], no_year]
+    sys.stderr = cStringIO.StringIO()
+    try:
+      self.assertRaises(SystemExit, babynames.main)
+    finally:
+      sys.argv = argv
+      sys.stderr = stderr
+    self.assertFalse(os.path.exists(filename + '.tmp'))
+    archive = binsummary.SummaryArchive(filename)
+    try:
+      self.assertEqual(self.names, archive.names(self.names[0]))
+    finally:
+      archive.close()
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,206 @@
+#!/usr/bin/python -tt
+
+"""Corpus generator and benchmark runner for wordcount.
+
+Builds text files of a given number of words from three kinds of corpus:
+
+  zipf     word ranks drawn from a Zipf distribution (s = 1) over the
+           vocabulary, like natural text
+  uniform  every vocabulary word equally likely, so the dict ends up as
+           large as it can get
+  alice    ../alice.txt copied out as many times as it takes
+
+and times each step of wordcount.py on them separately:
+
+  count    building the word/count dict with the chosen engine
+  words    print_words() from that dict (output sent to /dev/null)
+  top      print_top() from that dict
+
+The words/s figure is for the count step, the one the engines differ in.
+Every engine/corpus/size combination gets a process of its own (see
+../../benchrun.py), and with --profile dir it also leaves a cProfile dump
+named corpus-size-engine.prof in dir, for use with pstats.
+
+  ./bench_wordcount.py [--sizes 100000,1000000] [--vocab 50000]
+                       [--corpora zipf,uniform,alice] [--engines lines,...]
+                       [--dir dir] [--profile dir]
+"""
+
+import bisect
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import wordcount
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..'))
+import benchrun
+
+ALICE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                     'alice.txt')
+
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+# Words per output line, and lines per write.
+LINE_WORDS = 12
+BATCH_LINES = 10000
+
+
+def synthetic_word(n):
+  """Returns a distinct word for every integer n; every third is
+  capitalized, so lowercasing has something to do."""
+  letters = []
+  i = n
+  while True:
+    i, letter = divmod(i, 26)
+    letters.append(LETTERS[letter])
+    if not i:
+      break
+  word = ''.join(letters)
+  if n % 3 == 0:
+    word = word.capitalize()
+  return word
+
+
+def zipf_sampler(vocab, rand):
+  """Returns a function giving word numbers 0..vocab-1, number n drawn
+  with probability proportional to 1 / (n + 1)."""
+  cumulative = []
+  total = 0.0
+  for n in xrange(vocab):
+    total += 1.0 / (n + 1)
+    cumulative.append(total)
+  return lambda: bisect.bisect_left(cumulative, rand.random() * total)
+
+
+def write_corpus(filename, kind, words, vocab):
+  """Writes a corpus of about the given number of words."""
+  f = open(filename, 'w', 1 << 20)
+  if kind == 'alice':
+    alice = open(ALICE).read()
+    copies = max(1, -(-words // len(alice.split())))
+    for unused_i in xrange(copies):
+      f.write(alice)
+    f.close()
+    return
+
+  rand = random.Random(words)  # the same file every time for a size
+  if kind == 'zipf':
+    sample = zipf_sampler(vocab, rand)
+  else:
+    sample = lambda: rand.randrange(vocab)
+  names = [synthetic_word(n) for n in xrange(vocab)]
+  batch = []
+  for unused_i in xrange(words // LINE_WORDS):
+    batch.append(' '.join([names[sample()] for unused_j in
+                           xrange(LINE_WORDS)]) + '\n')
+    if len(batch) == BATCH_LINES:
+      f.write(''.join(batch))
+      batch = []
+  f.write(''.join(batch))
+  f.close()
+
+
+def run_stages(filename, engine):
+  """Runs count, words and top on filename.
+  Returns (tokens, distinct words, [(stage, seconds), ...])."""
+  times = []
+  start = time.time()
+  word_count = wordcount.ENGINES[engine](filename)
+  now = time.time()
+  times.append(('count', now - start))
+
+  stdout = sys.stdout
+  sys.stdout = open(os.devnull, 'w')
+  try:
+    start = time.time()
+    wordcount.print_words(filename, word_count)
+    now = time.time()
+    times.append(('words', now - start))
+
+    start = now
+    wordcount.print_top(filename, word_count)
+    times.append(('top', time.time() - start))
+  finally:
+    sys.stdout.close()
+    sys.stdout = stdout
+  return sum(word_count.itervalues()), len(word_count), times
+
+
+def main():
+  args = sys.argv[1:]
+  sizes = [100000, 1000000]
+  vocab = 50000
+  corpora = ['zipf', 'uniform', 'alice']
+  engines = sorted(wordcount.ENGINES)
+  dirname = None
+  profile_dir = None
+  while args:
+    if args[0] == '--sizes' and len(args) > 1:
+      sizes = [int(size) for size in args[1].split(',')]
+      del args[0:2]
+    elif args[0] == '--vocab' and len(args) > 1:
+      vocab = int(args[1])
+      del args[0:2]
+    elif args[0] == '--corpora' and len(args) > 1:
+      corpora = args[1].split(',')
+      del args[0:2]
+    elif args[0] == '--engines' and len(args) > 1:
+      engines = args[1].split(',')
+      del args[0:2]
+    elif args[0] == '--dir' and len(args) > 1:
+      dirname = args[1]
+      del args[0:2]
+    elif args[0] == '--profile' and len(args) > 1:
+      profile_dir = args[1]
+      del args[0:2]
+    else:
+      print ('usage: ./bench_wordcount.py [--sizes n,n,...] [--vocab n] '
+             '[--corpora zipf,uniform,alice]')
+      print ('                            [--engines name,...] [--dir dir] '
+             '[--profile dir]')
+      sys.exit(1)
+
+  temp_dir = None
+  if dirname is None:
+    dirname = temp_dir = tempfile.mkdtemp(prefix='wordcount-bench-')
+  elif not os.path.exists(dirname):
+    os.makedirs(dirname)
+  if profile_dir and not os.path.exists(profile_dir):
+    os.makedirs(profile_dir)
+
+  try:
+    for kind in corpora:
+      for size in sizes:
+        if kind == 'alice':
+          filename = os.path.join(dirname, 'alice%d.txt' % size)
+        else:
+          filename = os.path.join(dirname, '%s%d-%d.txt' % (kind, size, vocab))
+        # A corpus left in --dir by an earlier run is used as is.
+        if not os.path.exists(filename):
+          write_corpus(filename, kind, size, vocab)
+        for engine in engines:
+          profile_file = None
+          if profile_dir:
+            profile_file = os.path.join(profile_dir, '%s-%d-%s.prof' %
+                                        (kind, size, engine))
+          (tokens, distinct, times), peak_kb = benchrun.run_isolated(
+              run_stages, [filename, engine], profile_file)
+          count_seconds = times[0][1]
+          total = sum(seconds for stage, seconds in times)
+          print ('%-7s %-5s %9d words %7d distinct %7.3fs %10.0f words/s  '
+                 'peak %7.1f MB' % (kind, engine, tokens, distinct, total,
+                                    tokens / max(count_seconds, 1e-9),
+                                    peak_kb / 1024.0))
+          print '              ' + '  '.join('%s %.3fs' % stage
+                                             for stage in times)
+  finally:
+    if temp_dir:
+      shutil.rmtree(temp_dir)
+
+if __name__ == '__main__':
+  main()
@@ -41,6 +41,7 @@ columns, so the output looks better.
 
 """
 
+import array
 import random
 import sys
 
@@ -85,14 +86,153 @@ def print_mimic(mimic_dict, word):
   # LAB(end solution)
 
 
+# Bits per word id in the packed state and pair keys.
+ID_BITS = 32
+
+
+class MimicModel(object):
+  """
+  Compact, weighted form of the mimic dict.
+  Words are interned as ids into self.words, with '' as id 0. A state is
+  the ids of the last order words packed into one int, ID_BITS apiece,
+  oldest in the high bits; the start state is 0, i.e. order ''s, so with
+  order 1 a state is just the previous word's id. Each state seen in the
+  text owns a slice starts[index]:starts[index+1]
+  of flat arrays holding its distinct followers, and an alias table
+  (Vose's method) for picking one with probability proportional to how
+  often it followed. Memory grows with the number of distinct word pairs
+  instead of the size of the text, and picking the next word takes two
+  random numbers and a couple of array reads whatever the counts are.
+  """
+
+  def __init__(self, order=1):
+    self.order = order
+    self.state_mask = (1 << (ID_BITS * order)) - 1
+    self.words = ['']
+    self.ids = {'': 0}
+    self.states = {}  # state -> index into starts
+    self.starts = array.array('I', [0])
+    self.followers = array.array('I')
+    self.probs = array.array('d')
+    self.aliases = array.array('I')
+
+  def add_state(self, state, followers, counts):
+    """Adds a state's follower ids and their counts."""
+    n = len(followers)
+    total = float(sum(counts))
+    scaled = [count * n / total for count in counts]
+    probs = [1.0] * n
+    aliases = list(followers)
+    small = [i for i in range(n) if scaled[i] < 1.0]
+    large = [i for i in range(n) if scaled[i] >= 1.0]
+    while small and large:
+      less = small.pop()
+      more = large.pop()
+      # Slot less keeps its own share and hands the rest to follower more.
+      probs[less] = scaled[less]
+      aliases[less] = followers[more]
+      scaled[more] -= 1.0 - scaled[less]
+      if scaled[more] < 1.0:
+        small.append(more)
+      else:
+        large.append(more)
+    # Whatever is left over is 1.0 give or take rounding, so keeps 1.0.
+
+    self.states[state] = len(self.starts) - 1
+    self.followers.extend(followers)
+    self.probs.extend(probs)
+    self.aliases.extend(aliases)
+    self.starts.append(len(self.followers))
+
+  def build(self, pair_counts):
+    """Adds every state from a dict of packed (state, follower id) -> count."""
+    mask = (1 << ID_BITS) - 1
+    state = None
+    followers = []
+    counts = []
+    for key in sorted(pair_counts):
+      if key >> ID_BITS != state:
+        if followers:
+          self.add_state(state, followers, counts)
+        state = key >> ID_BITS
+        followers = []
+        counts = []
+      followers.append(key & mask)
+      counts.append(pair_counts[key])
+    if followers:
+      self.add_state(state, followers, counts)
+
+  def shift(self, state, word_id):
+    """Returns the state after state is followed by word_id."""
+    return ((state << ID_BITS) | word_id) & self.state_mask
+
+  def step(self, state):
+    """
+    Picks a random follower of state. Returns (its id, the new state).
+    A state never seen in the text falls back to the start state, as
+    print_mimic() goes back to '' -- and the history starts over from
+    there, rather than keeping the words that led nowhere.
+    """
+    index = self.states.get(state)
+    if index is None:
+      state = 0
+      index = self.states[0]
+    start = self.starts[index]
+    i = start + int(random.random() * (self.starts[index + 1] - start))
+    if random.random() < self.probs[i]:
+      word_id = self.followers[i]
+    else:
+      word_id = self.aliases[i]
+    return word_id, self.shift(state, word_id)
+
+
+def mimic_model(filename, order=1):
+  """Returns a MimicModel for the file, reading it a line at a time.
+  Each word is conditioned on the order words before it."""
+  model = MimicModel(order)
+  words = model.words
+  ids = model.ids
+  state_mask = model.state_mask
+  pair_counts = {}
+  state = 0
+  f = open(filename, 'r')
+  for line in f:
+    for word in line.split():
+      word_id = ids.get(word)
+      if word_id is None:
+        word_id = ids[word] = len(words)
+        words.append(word)
+      key = state << ID_BITS | word_id
+      pair_counts[key] = pair_counts.get(key, 0) + 1
+      state = key & state_mask
+  f.close()
+  model.build(pair_counts)
+  return model
+
+
+def print_model(model, word, count=200):
+  """Like print_mimic(), for a MimicModel: prints count random words."""
+  # An unknown start word falls back to '', as in print_mimic().
+  state = model.shift(0, model.ids.get(word, 0))
+  for unused_i in range(count):
+    print word,
+    word_id, state = model.step(state)
+    word = model.words[word_id]
+
+
 # Provided main(), calls mimic_dict() and mimic()
 def main():
-  if len(sys.argv) != 2:
-    print 'usage: ./mimic.py file-to-read'
+  args = sys.argv[1:]
+  order = 1
+  if len(args) > 1 and args[0] == '--order':
+    order = int(args[1])
+    del args[0:2]
+  if len(args) != 1 or order < 1:
+    print 'usage: ./mimic.py [--order N] file-to-read'
     sys.exit(1)
 
-  dict = mimic_dict(sys.argv[1])
-  print_mimic(dict, '')
+  model = mimic_model(args[0], order)
+  print_model(model, '')
 
 
 if __name__ == '__main__':
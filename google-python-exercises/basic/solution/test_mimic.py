@@ -0,0 +1,81 @@
+#!/usr/bin/python -tt
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import mimic
+
+TEXT = """the cat sat on the mat and the cat ate the rat
+and then the dog sat on the cat and the cat ran
+the end"""
+
+
+def alias_probabilities(model, state):
+  """Returns {follower id: probability} implied by state's alias table."""
+  index = model.states[state]
+  start = model.starts[index]
+  end = model.starts[index + 1]
+  share = 1.0 / (end - start)
+  result = {}
+  for i in range(start, end):
+    follower = model.followers[i]
+    alias = model.aliases[i]
+    result[follower] = result.get(follower, 0) + share * model.probs[i]
+    result[alias] = result.get(alias, 0) + share * (1 - model.probs[i])
+  return result
+
+
+class TestMimic(unittest.TestCase):
+
+  def setUp(self):
+    self.dirname = tempfile.mkdtemp()
+    self.filename = os.path.join(self.dirname, 'text.txt')
+    f = open(self.filename, 'w')
+    f.write(TEXT)
+    f.close()
+
+  def tearDown(self):
+    shutil.rmtree(self.dirname)
+
+  def test_alias_tables_match_counts(self):
+    model = mimic.mimic_model(self.filename)
+    mimic_dict = mimic.mimic_dict(self.filename)
+    self.assertEqual(len(mimic_dict), len(model.states))
+    for word, nexts in mimic_dict.items():
+      probabilities = alias_probabilities(model, model.ids[word])
+      expected = {}
+      for next_word in nexts:
+        next_id = model.ids[next_word]
+        expected[next_id] = expected.get(next_id, 0) + 1.0 / len(nexts)
+      self.assertEqual(set(expected), set(p for p in probabilities
+                                          if probabilities[p] > 1e-12))
+      for next_id in expected:
+        self.assertAlmostEqual(expected[next_id], probabilities[next_id])
+
+  def test_higher_order_follows_text(self):
+    words = TEXT.split()
+    for order in (1, 2, 3):
+      model = mimic.mimic_model(self.filename, order)
+      seen = set()
+      padded = [''] * order + words
+      for i in range(len(words)):
+        seen.add(tuple(padded[i:i + order + 1]))
+
+      random.seed(order)
+      history = [''] * order
+      state = 0
+      for unused_i in range(2000):
+        if state not in model.states:
+          # Unseen state: back to the start, as print_mimic() does.
+          history = [''] * order
+        word_id, state = model.step(state)
+        word = model.words[word_id]
+        self.assertTrue(tuple(history + [word]) in seen)
+        history = history[1:] + [word]
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,184 @@
+#!/usr/bin/python -tt
+
+import cStringIO
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+import wordcount
+
+WORDS = ['the', 'The', 'a', 'Alice', 'rabbit', 'hole', 'tea', 'Tea', 'party',
+         'queen', 'hatter', 'MARCH', 'hare', 'cat', 'grin', 'door']
+
+
+def write_text(filename, words, seed=0):
+  """Writes words random choices from WORDS, on lines of varying length."""
+  rand = random.Random(seed)
+  f = open(filename, 'w')
+  line = []
+  for unused_i in range(words):
+    line.append(rand.choice(WORDS))
+    if rand.random() < 0.1:
+      f.write(' '.join(line) + '\n')
+      line = []
+  f.write(' '.join(line) + '\n')
+  f.close()
+
+
+class TestWordcount(unittest.TestCase):
+
+  def setUp(self):
+    self.dirname = tempfile.mkdtemp()
+    self.filename = os.path.join(self.dirname, 'text.txt')
+    write_text(self.filename, 20000)
+    # Small ranges and blocks, so a small file still gets cut up.
+    self.saved = wordcount.MIN_RANGE, wordcount.BLOCK_SIZE
+    wordcount.MIN_RANGE = 1000
+    wordcount.BLOCK_SIZE = 300
+
+  def tearDown(self):
+    wordcount.MIN_RANGE, wordcount.BLOCK_SIZE = self.saved
+    shutil.rmtree(self.dirname)
+
+  def test_jobs_same_as_word_count_dict(self):
+    expected = wordcount.word_count_dict(self.filename)
+    for engine in sorted(wordcount.ENGINES):
+      word_count = wordcount.count_files([self.filename], 3, engine)
+      self.assertEqual(expected, word_count)
+      self.assertEqual(list(wordcount.word_lines(expected)),
+                       list(wordcount.word_lines(word_count)))
+      # Ties in the top list come out in the same order too.
+      self.assertEqual(list(wordcount.top_lines(expected)),
+                       list(wordcount.top_lines(word_count)))
+
+  def test_jobs_several_files(self):
+    other = os.path.join(self.dirname, 'other.txt')
+    write_text(other, 5000, seed=1)
+    expected = wordcount.word_count_dict(self.filename)
+    wordcount.merge_counts(expected,
+                           wordcount.word_count_dict(other).iteritems())
+    word_count = wordcount.count_files([self.filename, other], 2)
+    self.assertEqual(expected, word_count)
+
+  def test_space_saving_error_bound(self):
+    rand = random.Random(2)
+    stream = ['w%d' % int(rand.paretovariate(1.0)) for unused_i in
+              range(20000)]
+    true_counts = {}
+    for word in stream:
+      true_counts[word] = true_counts.get(word, 0) + 1
+    capacity = 50
+    self.assertTrue(len(true_counts) > capacity)
+
+    sketch = wordcount.SpaceSaving(capacity)
+    for word in stream:
+      sketch.add(word)
+    bound = len(stream) / float(capacity)
+    for word, count in sketch.counts.iteritems():
+      true = true_counts[word]
+      self.assertTrue(true <= count <= true + sketch.error(word))
+      self.assertTrue(sketch.error(word) <= bound)
+    for word, true in true_counts.iteritems():
+      if true > bound:
+        self.assertTrue(word in sketch.counts)
+
+  def test_approx_top_exact_with_room(self):
+    sketch = wordcount.approx_top([self.filename], len(WORDS))
+    expected = wordcount.word_count_dict(self.filename)
+    self.assertEqual(expected, sketch.counts)
+
+  def test_hyperloglog_estimate(self):
+    for precision, distinct in [(10, 500), (12, 50000), (14, 20000)]:
+      sketch = wordcount.HyperLogLog(precision)
+      sketch.update('word%d' % i for i in range(distinct))
+      # Adding words again must not change the estimate.
+      sketch.update('word%d' % i for i in range(0, distinct, 7))
+      std_error = 1.04 / math.sqrt(1 << precision)
+      self.assertTrue(abs(sketch.estimate() / distinct - 1) < 4 * std_error)
+
+  def test_hyperloglog_merge(self):
+    first = wordcount.HyperLogLog(12)
+    first.update('word%d' % i for i in range(0, 6000))
+    second = wordcount.HyperLogLog(12)
+    second.update('word%d' % i for i in range(4000, 10000))
+    both = wordcount.HyperLogLog(12)
+    both.update('word%d' % i for i in range(10000))
+    first.merge(second)
+    self.assertEqual(both.registers, first.registers)
+    self.assertRaises(ValueError, first.merge, wordcount.HyperLogLog(10))
+
+  def test_distinct_sketch_jobs(self):
+    single = wordcount.distinct_sketch([self.filename], 12)
+    parallel = wordcount.distinct_sketch([self.filename], 12, jobs=3)
+    self.assertEqual(single.registers, parallel.registers)
+    self.assertEqual(len(WORDS) - 2, int(round(single.estimate())))
+
+  def test_spill_same_as_print_words(self):
+    # Few slots per run and a small fan-in, so the merge takes passes.
+    saved = wordcount.MAX_FANIN
+    wordcount.MAX_FANIN = 4
+    stdout = sys.stdout
+    sys.stdout = out = cStringIO.StringIO()
+    try:
+      runs = wordcount.spill_runs([self.filename], 3,
+                                  tempfile.mkdtemp(dir=self.dirname))
+      self.assertTrue(len(runs) > wordcount.MAX_FANIN ** 2)
+      wordcount.print_words_external([self.filename], 3, self.dirname)
+    finally:
+      sys.stdout = stdout
+      wordcount.MAX_FANIN = saved
+    expected = wordcount.word_lines(wordcount.word_count_dict(self.filename))
+    self.assertEqual(''.join(expected), out.getvalue())
+
+  def db_counts(self, filenames):
+    """Updates the db in the test dir with filenames; returns the
+    totals, as read back by a fresh load."""
+    db_dir = os.path.join(self.dirname, 'counts.db')
+    db = wordcount.load_db(db_dir)
+    if wordcount.update_db(db, db_dir, filenames):
+      wordcount.save_db(db_dir, db)
+    return wordcount.load_db(db_dir)['counts']
+
+  def test_db_new_files(self):
+    other = os.path.join(self.dirname, 'other.txt')
+    write_text(other, 5000, seed=1)
+    self.assertEqual(wordcount.count_files([self.filename]),
+                     self.db_counts([self.filename]))
+    self.assertEqual(wordcount.count_files([self.filename, other]),
+                     self.db_counts([self.filename, other]))
+
+  def test_db_edited_file(self):
+    self.db_counts([self.filename])
+    f = open(self.filename, 'a')
+    f.write('the cheshire cat\n')
+    f.close()
+    self.assertEqual(wordcount.count_files([self.filename]),
+                     self.db_counts([self.filename]))
+    # Same size, different content, older mtime.
+    write_text(self.filename, 20000, seed=3)
+    os.utime(self.filename, (1000000000, 1000000000))
+    self.assertEqual(wordcount.count_files([self.filename]),
+                     self.db_counts([self.filename]))
+    # Only the current content's counts are kept.
+    counts_files = [name for name in
+                    os.listdir(os.path.join(self.dirname, 'counts.db'))
+                    if name.endswith('.counts')]
+    self.assertEqual(1, len(counts_files))
+
+  def test_db_duplicate_content(self):
+    copy = os.path.join(self.dirname, 'copy.txt')
+    shutil.copy(self.filename, copy)
+    self.assertEqual(wordcount.count_files([self.filename, copy]),
+                     self.db_counts([self.filename, copy]))
+    # Touching a file without changing it changes nothing.
+    os.utime(copy, (1000000000, 1000000000))
+    self.assertEqual(wordcount.count_files([self.filename, copy]),
+                     self.db_counts([self.filename, copy]))
+
+
+if __name__ == '__main__':
+  unittest.main()
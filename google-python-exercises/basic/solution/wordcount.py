@@ -37,7 +37,27 @@ print_words() and print_top().
 
 """
 
+import cPickle
+import hashlib
+import heapq
+import itertools
+import marshal
+import math
+import mmap
+import multiprocessing
+import os
+import shutil
+import string
+import struct
 import sys
+import tempfile
+import time
+
+# zinput.py (transparent .gz/.bz2/.xz reading) lives at the top of the
+# exercises tree, shared with logpuzzle.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..'))
+import zinput
 
 # +++your code here+++
 # Define print_words(filename) and print_top(filename) functions.
@@ -51,7 +71,7 @@ def word_count_dict(filename):
   """Returns a word/count dict for this filename."""
   # Utility used by count() and Topcount().
   word_count = {}  # Map each word to its count
-  input_file = open(filename, 'r')
+  input_file = zinput.open_input(filename, 'r')
   for line in input_file:
     words = line.split()
     for word in words:
@@ -65,12 +85,18 @@ def word_count_dict(filename):
   return word_count
 
 
-def print_words(filename):
-  """Prints one per line '<word> <count>' sorted by word for the given file."""
-  word_count = word_count_dict(filename)
-  words = sorted(word_count.keys())
-  for word in words:
-    print word, word_count[word]
+def word_lines(word_count):
+  """Yields the '<word> <count>' lines of print_words(), sorted by word."""
+  for word in sorted(word_count):
+    yield '%s %d\n' % (word, word_count[word])
+
+
+def print_words(filename, word_count=None):
+  """Prints one per line '<word> <count>' sorted by word for the given file.
+  A word_count dict that was already built can be passed in instead."""
+  if word_count is None:
+    word_count = word_count_dict(filename)
+  sys.stdout.writelines(word_lines(word_count))
 
 
 def get_count(word_count_tuple):
@@ -78,37 +104,998 @@ def get_count(word_count_tuple):
   return word_count_tuple[1]
 
 
-def print_top(filename):
-  """Prints the top count listing for the given file."""
-  word_count = word_count_dict(filename)
-
+def top_lines(word_count):
+  """Yields the '<word> <count>' lines of print_top(), biggest count first."""
   # Each item is a (word, count) tuple.
-  # Sort them so the big counts are first using key=get_count() to extract count.
-  items = sorted(word_count.items(), key=get_count, reverse=True)
+  # Pick the 20 biggest counts using key=get_count() to extract count.
+  # nlargest() keeps a 20-entry heap instead of sorting every word, and
+  # gives the same order as sorted(..., reverse=True)[:20], ties included.
+  for item in heapq.nlargest(20, word_count.iteritems(), key=get_count):
+    yield '%s %d\n' % item
+
 
-  # Print the first 20
-  for item in items[:20]:
-    print item[0], item[1]
+def print_top(filename, word_count=None):
+  """Prints the top count listing for the given file (or word_count dict)."""
+  if word_count is None:
+    word_count = word_count_dict(filename)
+  sys.stdout.writelines(top_lines(word_count))
 
 ##### LAB(end solution)
 
 
+# What str.split() with no arguments splits on.
+WHITESPACE = ' \t\n\r\x0b\x0c'
+
+# Read size inside a worker, and the smallest byte range worth a worker.
+BLOCK_SIZE = 1 << 20
+MIN_RANGE = 1 << 20
+
+
+def next_whitespace(f, pos):
+  """Returns the offset of the first whitespace char at or after pos in the
+  open file f, or the file size if there is none."""
+  f.seek(pos)
+  while True:
+    block = f.read(64 * 1024)
+    if not block:
+      return f.tell()
+    for i, c in enumerate(block):
+      if c in WHITESPACE:
+        return pos + i
+    pos += len(block)
+
+
+def split_ranges(filename, pieces):
+  """
+  Splits the file into up to `pieces` (filename, start, end) byte ranges,
+  each boundary moved forward onto a whitespace char so that no word is
+  cut in two.
+  """
+  size = os.path.getsize(filename)
+  pieces = max(1, min(pieces, size // MIN_RANGE))
+  f = open(filename, 'rb')
+  bounds = [0]
+  for i in range(1, pieces):
+    bounds.append(max(bounds[-1], next_whitespace(f, size * i // pieces)))
+  f.close()
+  bounds.append(size)
+  return [(filename, start, end) for start, end in zip(bounds, bounds[1:])
+          if start < end]
+
+
+def count_range(job):
+  """
+  Pool worker: counts one (filename, start, end, engine) byte range,
+  reading it a block at a time with the engine's RANGE_READERS entry.
+  Returns a list of (word, count) pairs in the order each word first
+  appears, so that the merged dict can be built in the same order as
+  word_count_dict() would build it.
+  """
+  filename, start, end, engine = job
+  word_count = {}
+  order = []
+  for block in RANGE_READERS[engine](filename, start, end):
+    count_block(block, word_count, order)
+  return [(word, word_count[word]) for word in order]
+
+
+def range_blocks(filename, start, end):
+  """Yields the bytes start..end of the file in blocks of about
+  BLOCK_SIZE, each cut on whitespace so that no word spans two blocks."""
+  f = open(filename, 'rb')
+  f.seek(start)
+  left = end - start
+  carry = ''  # partial word at the end of the last block
+  while left > 0:
+    block = f.read(min(BLOCK_SIZE, left))
+    if not block:
+      break
+    left -= len(block)
+    block = carry + block
+    carry = ''
+    if left > 0 and block[-1] not in WHITESPACE:
+      cut = max(block.rfind(c) for c in WHITESPACE)
+      carry = block[cut + 1:]
+      block = block[:cut + 1]
+    yield block
+  f.close()
+  if carry:
+    yield carry
+
+
+def count_block(text, word_count, order):
+  """Counts the words in text into word_count, appending new words to order."""
+  for word in text.lower().split():
+    if word in word_count:
+      word_count[word] += 1
+    else:
+      word_count[word] = 1
+      order.append(word)
+
+
+def merge_counts(total, word_counts):
+  """Adds (word, count) pairs into the total dict."""
+  get = total.get
+  for word, count in word_counts:
+    total[word] = get(word, 0) + count
+  return total
+
+
+# Translation table for lowercasing a whole block with str.translate().
+# Same result as str.lower(), which only touches ASCII letters here.
+LOWER = string.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def mmap_blocks(filename, start=0, end=None):
+  """Yields the bytes start..end (default: the whole file) of an mmap of
+  the file in blocks of about BLOCK_SIZE, each cut on whitespace so that
+  no word spans two blocks."""
+  f = open(filename, 'rb')
+  size = os.fstat(f.fileno()).st_size
+  if not size:
+    # mmap refuses empty files.
+    f.close()
+    return
+  mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+  f.close()
+  if end is None:
+    end = size
+
+  try:
+    while start < end:
+      stop = min(start + BLOCK_SIZE, end)
+      if stop < end:
+        # Move the cut back to just after the last whitespace in the block.
+        cut = max(mm.rfind(c, start, stop) for c in WHITESPACE)
+        if cut >= start:
+          stop = cut + 1
+        else:
+          stop = min(next_whitespace_mm(mm, stop, size), end)
+      yield mm[start:stop]
+      start = stop
+  finally:
+    mm.close()
+
+
+def mmap_word_count(filename):
+  """
+  Same dict as word_count_dict(), built without a str per line: the file
+  is mmapped, lowercased a BLOCK_SIZE block at a time with LOWER, and each
+  block (cut on whitespace) is split once.
+  """
+  word_count = {}
+  for block in mmap_blocks(filename):
+    for word in block.translate(LOWER).split():
+      if word in word_count:
+        word_count[word] += 1
+      else:
+        word_count[word] = 1
+  return word_count
+
+
+def next_whitespace_mm(mm, pos, size):
+  """Offset of the first whitespace at or after pos in mm, else size."""
+  found = [i for i in (mm.find(c, pos) for c in WHITESPACE) if i != -1]
+  return min(found) if found else size
+
+
+# Engine name -> function(filename) returning a word/count dict.
+ENGINES = {
+    'lines': word_count_dict,
+    'mmap': mmap_word_count,
+}
+
+# Engine name -> function(filename, start, end) yielding a byte range of
+# the file in whitespace-cut blocks, for the --jobs workers.
+RANGE_READERS = {
+    'lines': range_blocks,
+    'mmap': mmap_blocks,
+}
+
+
+class SpaceSaving(object):
+  """
+  Space-Saving heavy-hitters sketch: approximate top-K counts in a fixed
+  number of slots, however many distinct words go past.
+
+  At most `capacity` words are tracked. A new word takes over the slot of
+  the tracked word with the smallest count c, starting at c + 1 and
+  remembering c as its possible overcount. With N words seen in total:
+   -every reported count is >= the true count, and at most its
+    error() higher; error() is never more than N / capacity
+   -every word whose true count is more than N / capacity is tracked
+  So with capacity well above K the top K comes out exact for any word
+  clearly more common than N / capacity.
+  """
+
+  def __init__(self, capacity):
+    self.capacity = capacity
+    self.counts = {}
+    self.errors = {}
+    # One (count, word) entry per tracked word. Counts are only raised
+    # here when the entry reaches the top, so they may be stale (low).
+    self.heap = []
+    self.total = 0
+
+  def add(self, word):
+    self.total += 1
+    counts = self.counts
+    if word in counts:
+      counts[word] += 1
+      return
+    if len(counts) < self.capacity:
+      counts[word] = 1
+      self.errors[word] = 0
+      heapq.heappush(self.heap, (1, word))
+      return
+    # Find the true minimum: a stale entry goes back with its real count.
+    while True:
+      count, victim = self.heap[0]
+      if counts[victim] == count:
+        break
+      heapq.heapreplace(self.heap, (counts[victim], victim))
+    del counts[victim]
+    del self.errors[victim]
+    counts[word] = count + 1
+    self.errors[word] = count
+    heapq.heapreplace(self.heap, (count + 1, word))
+
+  def error(self, word):
+    """Most the count for word can be over by."""
+    return self.errors[word]
+
+  def top(self, k):
+    """Returns the k biggest (word, count) pairs, biggest first."""
+    return heapq.nlargest(k, self.counts.iteritems(), key=get_count)
+
+
+def approx_top(filenames, capacity, k=20):
+  """Streams the files through a SpaceSaving sketch of the given capacity
+  -- no full word/count dict -- and returns the sketch."""
+  sketch = SpaceSaving(capacity)
+  add = sketch.add
+  for filename in filenames:
+    input_file = zinput.open_input(filename, 'r')
+    for line in input_file:
+      for word in line.lower().split():
+        add(word)
+    input_file.close()
+  return sketch
+
+
+def count_files(filenames, jobs=1, engine='lines'):
+  """
+  Returns the combined word/count dict for all the files, counted by
+  the named engine from ENGINES.
+  With jobs > 1 each file is cut into whitespace-aligned byte ranges that
+  a pool of worker processes counts in parallel (map), each reading its
+  range the engine's way (RANGE_READERS), and the partial
+  counts are added up in file order (reduce). Adding them in order keeps
+  the dict -- and so the order of ties in print_top() -- the same as
+  word_count_dict() gives.
+  Compressed files can only be streamed: they are counted whole, with
+  the 'lines' engine, in this process while the workers get on with the
+  ranges of the plain files.
+  """
+  compressed = set(filename for filename in filenames
+                   if zinput.detect(filename))
+  if jobs <= 1 or len(compressed) == len(filenames):
+    engines = [ENGINES['lines'] if filename in compressed else ENGINES[engine]
+               for filename in filenames]
+    if len(filenames) == 1:
+      return engines[0](filenames[0])
+    word_count = {}
+    for filename, count_file in zip(filenames, engines):
+      merge_counts(word_count, count_file(filename).iteritems())
+    return word_count
+
+  file_ranges = []
+  for filename in filenames:
+    if filename in compressed:
+      file_ranges.append([])
+    else:
+      file_ranges.append([(filename, start, end, engine) for filename, start,
+                          end in split_ranges(filename, jobs * 4)])
+  pool = multiprocessing.Pool(jobs)
+  try:
+    partials = pool.imap(count_range, [job for ranges in file_ranges
+                                       for job in ranges])
+    word_count = {}
+    for filename, ranges in zip(filenames, file_ranges):
+      if filename in compressed:
+        merge_counts(word_count, word_count_dict(filename).iteritems())
+      for unused_job in ranges:
+        merge_counts(word_count, partials.next())
+    return word_count
+  finally:
+    pool.terminate()
+
+
+class HyperLogLog(object):
+  """
+  HyperLogLog sketch of how many distinct words have been added.
+  Uses 2**precision one-byte registers (16 KB at the default 14) whatever
+  the vocabulary size, with a standard error of about
+  1.04 / sqrt(2**precision) -- 0.8% at 14, 1.6% at 12, 0.4% at 16.
+  That is on top of a known bias of the raw estimate: from about 2.5 to
+  5 times 2**precision distinct words, just past where linear counting
+  stops being used, it runs high by up to 1-2%. (HyperLogLog++ corrects
+  this with empirical bias tables; this sketch does not.)
+  Words are hashed with md5, so sketches built in different processes or
+  runs can be merged, giving the sketch of the combined input.
+  """
+
+  def __init__(self, precision=14):
+    if not 4 <= precision <= 18:
+      raise ValueError('precision must be between 4 and 18')
+    self.precision = precision
+    self.registers = bytearray(1 << precision)
+
+  def add(self, word):
+    h = struct.unpack('<Q', hashlib.md5(word).digest()[:8])[0]
+    index = h >> (64 - self.precision)
+    # Position of the first 1 bit in the remaining 64 - precision bits.
+    rest = h & ((1 << (64 - self.precision)) - 1)
+    rank = 64 - self.precision - rest.bit_length() + 1
+    if rank > self.registers[index]:
+      self.registers[index] = rank
+
+  def update(self, words):
+    for word in words:
+      self.add(word)
+
+  def merge(self, other):
+    """Folds another sketch of the same precision into this one."""
+    if other.precision != self.precision:
+      raise ValueError('cannot merge sketches of different precision')
+    self.registers = bytearray(map(max, self.registers, other.registers))
+
+  def estimate(self):
+    """Returns the estimated number of distinct words added."""
+    m = len(self.registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+    zeros = self.registers.count('\x00')
+    if estimate <= 2.5 * m and zeros:
+      # Few words: linear counting of the empty registers is more exact.
+      estimate = m * math.log(float(m) / zeros)
+    return estimate
+
+
+def distinct_range(job):
+  """Pool worker: returns the HyperLogLog registers for one
+  (filename, start, end, precision) byte range."""
+  filename, start, end, precision = job
+  sketch = HyperLogLog(precision)
+  for block in range_blocks(filename, start, end):
+    # Hash each distinct word in the block once.
+    sketch.update(set(block.lower().split()))
+  return sketch.registers
+
+
+def sketch_file(sketch, filename):
+  """Streams the (possibly compressed) file's words into sketch."""
+  batch = set()
+  input_file = zinput.open_input(filename, 'r')
+  for line in input_file:
+    batch.update(line.lower().split())
+    if len(batch) >= 100000:
+      sketch.update(batch)
+      batch.clear()
+  input_file.close()
+  sketch.update(batch)
+
+
+def distinct_sketch(filenames, precision=14, jobs=1):
+  """
+  Returns a HyperLogLog sketch of the distinct lowercase words in the
+  files, without building a word/count dict. With jobs > 1 the byte
+  ranges of the uncompressed files are sketched by worker processes
+  while compressed ones are streamed here, and the sketches are merged.
+  """
+  sketch = HyperLogLog(precision)
+  compressed = [filename for filename in filenames if zinput.detect(filename)]
+  if jobs <= 1 or len(compressed) == len(filenames):
+    for filename in filenames:
+      sketch_file(sketch, filename)
+    return sketch
+
+  ranges = []
+  for filename in filenames:
+    if filename not in compressed:
+      ranges.extend((filename, start, end, precision) for filename, start, end
+                    in split_ranges(filename, jobs * 4))
+  pool = multiprocessing.Pool(jobs)
+  try:
+    partials = pool.imap_unordered(distinct_range, ranges)
+    for filename in compressed:
+      sketch_file(sketch, filename)
+    for registers in partials:
+      partial = HyperLogLog(precision)
+      partial.registers = registers
+      sketch.merge(partial)
+    return sketch
+  finally:
+    pool.terminate()
+
+
+def write_run(word_count, dirname, number):
+  """Writes word_count sorted by word as a 'word count' line file and
+  returns its name."""
+  filename = os.path.join(dirname, 'run%05d' % number)
+  f = open(filename, 'wb', 1 << 16)
+  f.writelines('%s %d\n' % (word, word_count[word])
+               for word in sorted(word_count))
+  f.close()
+  return filename
+
+
+def read_run(filename):
+  """Yields the (word, count) pairs of a run file, in order."""
+  f = open(filename, 'rb', 1 << 16)
+  for line in f:
+    word, count = line.rsplit(' ', 1)
+    yield word, int(count)
+  f.close()
+
+
+def spill_runs(filenames, max_words, dirname):
+  """
+  Counts the files, writing the counts out as a sorted run file each time
+  the dict reaches max_words distinct words, so memory stays bounded.
+  Returns the run file names.
+  """
+  runs = []
+  word_count = {}
+  for filename in filenames:
+    input_file = zinput.open_input(filename, 'r')
+    for line in input_file:
+      for word in line.lower().split():
+        if word in word_count:
+          word_count[word] += 1
+        else:
+          word_count[word] = 1
+          # Checked per new word, so even one huge line stays bounded.
+          if len(word_count) >= max_words:
+            runs.append(write_run(word_count, dirname, len(runs)))
+            word_count = {}
+    input_file.close()
+  if word_count:
+    runs.append(write_run(word_count, dirname, len(runs)))
+  return runs
+
+
+# Most run files merged at once; more than this are merged in passes.
+MAX_FANIN = 128
+
+
+def merged_counts(runs, dirname=None):
+  """k-way merges sorted run files, yielding (word, total count) in word
+  order with the counts of equal words summed. With more than MAX_FANIN
+  runs, groups of them are first merged into bigger runs in dirname so
+  the number of open files stays bounded."""
+  while len(runs) > MAX_FANIN:
+    merged_runs = []
+    for i in range(0, len(runs), MAX_FANIN):
+      filename = os.path.join(dirname, 'merge%05d' % len(merged_runs))
+      f = open(filename + '.tmp', 'wb', 1 << 16)
+      f.writelines('%s %d\n' % pair
+                   for pair in merged_counts(runs[i:i + MAX_FANIN]))
+      f.close()
+      for run in runs[i:i + MAX_FANIN]:
+        os.remove(run)
+      os.rename(filename + '.tmp', filename)
+      merged_runs.append(filename)
+    runs = merged_runs
+  merged = heapq.merge(*[read_run(run) for run in runs])
+  for word, pairs in itertools.groupby(merged, key=lambda pair: pair[0]):
+    yield word, sum(count for unused_word, count in pairs)
+
+
+def print_words_external(filenames, max_words, tmp_dir=None):
+  """
+  Same output as print_words() for vocabularies bigger than memory: the
+  counts are spilled to sorted run files of at most max_words words in
+  a temp directory, then streamed out through a k-way merge.
+  """
+  dirname = tempfile.mkdtemp(prefix='wordcount-', dir=tmp_dir)
+  try:
+    out = sys.stdout
+    runs = spill_runs(filenames, max_words, dirname)
+    for word, count in merged_counts(runs, dirname):
+      out.write('%s %d\n' % (word, count))
+  finally:
+    shutil.rmtree(dirname)
+
+
+# Output buffer for report files.
+REPORT_BUFFER = 1 << 20
+
+# Report kind -> function(word_count) returning its lines.
+REPORTS = {
+    'count': word_lines,
+    'top': top_lines,
+    'distinct': lambda word_count: ['%d\n' % len(word_count)],
+    'total': lambda word_count: ['%d\n' % sum(word_count.itervalues())],
+}
+
+
+def write_reports(word_count, outputs):
+  """
+  Writes several reports from one word_count dict, so the input is only
+  tokenized once. outputs is a list of (kind, filename) pairs, kind being
+  one of REPORTS ('count' and 'top' match --count and --topcount) and
+  filename '-' for stdout. Each report goes out through a large buffer
+  with one writelines().
+  """
+  for kind, filename in outputs:
+    lines = REPORTS[kind](word_count)
+    if filename == '-':
+      sys.stdout.writelines(lines)
+      sys.stdout.flush()
+    else:
+      f = open(filename, 'w', REPORT_BUFFER)
+      f.writelines(lines)
+      f.close()
+
+
+class TopK(object):
+  """
+  The k biggest counts of a word/count dict whose counts only go up,
+  kept up to date one increment at a time instead of re-sorting.
+  Call update(word, count) after every change to count[word].
+  A word outside the top can only get in by passing the smallest count
+  in it (the floor), so most updates are a single comparison.
+  """
+
+  def __init__(self, k=20):
+    self.k = k
+    self.top = {}  # word -> count for the current top k
+    self.floor = 0
+
+  def update(self, word, count):
+    top = self.top
+    if word in top:
+      old = top[word]
+      top[word] = count
+      if old == self.floor and len(top) == self.k:
+        self.floor = min(top.itervalues())
+    elif len(top) < self.k:
+      top[word] = count
+      if len(top) == self.k:
+        self.floor = min(top.itervalues())
+    elif count > self.floor:
+      lowest = min(top, key=top.get)
+      del top[lowest]
+      top[word] = count
+      self.floor = min(top.itervalues())
+
+  def items(self):
+    """Returns the (word, count) pairs, biggest count first."""
+    return sorted(self.top.iteritems(), key=get_count, reverse=True)
+
+
+def follow(filename, interval=2.0, k=20):
+  """
+  Tails filename forever like 'tail -F', counting only newly appended
+  bytes, and every interval seconds prints the top k words if anything
+  changed. A file that shrinks (truncated) is re-read from the start; a
+  file replaced by a new one (rotated) is finished off and then the new
+  one is read from the start. Counts carry on across both.
+  """
+  word_count = {}
+  topk = TopK(k)
+  # Raw os-level reads, so no stdio buffering or EOF state gets in the way
+  # of seeing bytes appended after we reached the end.
+  fd = None
+  inode = None
+  carry = ''  # a word that may still be growing at the end of the file
+
+  def count(text):
+    """Counts the words in text; returns True if there were any."""
+    words = text.lower().split()
+    for word in words:
+      word_count[word] = word_count.get(word, 0) + 1
+      topk.update(word, word_count[word])
+    return bool(words)
+
+  def read_new():
+    """Reads everything appended to fd since the last call."""
+    blocks = []
+    while True:
+      block = os.read(fd, BLOCK_SIZE)
+      if not block:
+        return ''.join(blocks)
+      blocks.append(block)
+
+  while True:
+    changed = False
+    try:
+      st = os.stat(filename)
+    except OSError:
+      st = None  # rotated away and not recreated yet
+    if st and st.st_ino != inode:
+      if fd is not None:
+        # Rotated: take whatever was appended to the old file first.
+        if count(carry + read_new()):
+          changed = True
+        os.close(fd)
+      fd = os.open(filename, os.O_RDONLY)
+      inode = st.st_ino
+      carry = ''
+    elif st and st.st_size < os.lseek(fd, 0, os.SEEK_CUR):
+      # Truncated: start again from the top.
+      os.lseek(fd, 0, os.SEEK_SET)
+      carry = ''
+    if fd is not None:
+      text = read_new()
+      if text:
+        text = carry + text
+        cut = max(text.rfind(c) for c in WHITESPACE) + 1
+        carry = text[cut:]
+        if count(text[:cut]):
+          changed = True
+    if changed:
+      print '--- %s' % time.strftime('%H:%M:%S')
+      for word, word_total in topk.items():
+        print word, word_total
+      sys.stdout.flush()
+    time.sleep(interval)
+
+
+# Bits per word id in a packed n-gram key.
+NGRAM_BITS = 32
+NGRAM_ID_MASK = (1 << NGRAM_BITS) - 1
+
+
+def ngram_counts(filenames, n):
+  """
+  Counts the n-grams of lowercased str.split() words in the files
+  (n-grams do not run across files). Each word gets an interned integer
+  id, and an n-gram key is its ids packed NGRAM_BITS apart into one
+  integer -- a plain int for bigrams -- rather than a joined string.
+  Returns (counts, words): packed key -> count, and id -> word.
+  """
+  ids = {}
+  words = []
+  counts = {}
+  key_mask = (1 << (NGRAM_BITS * n)) - 1
+  for filename in filenames:
+    key = 0
+    seen = 0
+    input_file = zinput.open_input(filename, 'r')
+    for line in input_file:
+      for word in line.lower().split():
+        word_id = ids.get(word)
+        if word_id is None:
+          word_id = len(words)
+          ids[word] = word_id
+          words.append(intern(word))
+        # Roll the window: shift out the oldest word, add the new one.
+        key = ((key << NGRAM_BITS) | word_id) & key_mask
+        seen += 1
+        if seen >= n:
+          counts[key] = counts.get(key, 0) + 1
+    input_file.close()
+  return counts, words
+
+
+def ngram_words(key, n, words):
+  """Unpacks an n-gram key back into its tuple of words."""
+  result = []
+  for unused_i in range(n):
+    result.append(words[key & NGRAM_ID_MASK])
+    key >>= NGRAM_BITS
+  result.reverse()
+  return tuple(result)
+
+
+def renumber(key, n, new_ids):
+  """Returns the n-gram key with each word id replaced by new_ids[id]."""
+  result = 0
+  for i in range(n):
+    shift = NGRAM_BITS * i
+    result |= new_ids[(key >> shift) & NGRAM_ID_MASK] << shift
+  return result
+
+
+def print_ngrams(counts, words, n, top=False):
+  """Prints '<word> ... <word> <count>' lines like print_words(), or the 20
+  most common like print_top() when top is set."""
+  if top:
+    for key, count in heapq.nlargest(20, counts.iteritems(), key=get_count):
+      print ' '.join(ngram_words(key, n, words)), count
+    return
+
+  # Renumber the words in alphabetical order, so that the repacked keys
+  # sort as their word tuples would -- sorting plain ints, with no tuple
+  # of strings built per n-gram.
+  by_word = sorted(xrange(len(words)), key=words.__getitem__)
+  word_rank = [0] * len(words)
+  for rank, word_id in enumerate(by_word):
+    word_rank[word_id] = rank
+  sorted_words = [words[word_id] for word_id in by_word]
+  for key in sorted(renumber(key, n, word_rank) for key in counts):
+    count = counts[renumber(key, n, by_word)]
+    print ' '.join(ngram_words(key, n, sorted_words)), count
+
+
+def file_digest(filename):
+  """Returns the md5 hex digest of the file's contents."""
+  digest = hashlib.md5()
+  f = open(filename, 'rb')
+  while True:
+    block = f.read(BLOCK_SIZE)
+    if not block:
+      break
+    digest.update(block)
+  f.close()
+  return digest.hexdigest()
+
+
+def load_db(db_dir):
+  """
+  Loads the index of the persistent counts database in the directory
+  db_dir, or returns an empty one:
+    'counts'  word/count totals over every file counted so far
+    'files'   abspath -> (size, mtime, digest) of each file counted
+  Each file's own word/count dict is kept in a file of its own (see
+  file_counts_path()) and only read when that file has changed, so a run
+  reads the totals but not every file's counts.
+  """
+  index = os.path.join(db_dir, 'index')
+  if not os.path.exists(index):
+    return {'counts': {}, 'files': {}}
+  f = open(index, 'rb')
+  db = cPickle.load(f)
+  f.close()
+  return db
+
+
+def file_counts_path(db_dir, path, digest):
+  """Returns where the counts of path's content with this digest are kept."""
+  return os.path.join(db_dir, '%s-%s.counts' % (hashlib.md5(path).hexdigest(),
+                                                digest))
+
+
+def write_atomic(filename, data):
+  """Writes data through a temp file and a rename, so a crash part way
+  through leaves any old file intact."""
+  tmp_filename = filename + '.tmp'
+  f = open(tmp_filename, 'wb')
+  f.write(data)
+  f.close()
+  os.rename(tmp_filename, filename)
+
+
+def save_db(db_dir, db):
+  """
+  Writes the index, then removes the per-file counts it no longer refers
+  to. Counts files are named by content digest, so until the new index is
+  in place the old one still finds everything it needs.
+  """
+  write_atomic(os.path.join(db_dir, 'index'),
+               cPickle.dumps(db, cPickle.HIGHEST_PROTOCOL))
+  keep = set(os.path.basename(file_counts_path(db_dir, path, known[2]))
+             for path, known in db['files'].iteritems())
+  for name in os.listdir(db_dir):
+    if name.endswith('.counts') and name not in keep:
+      os.remove(os.path.join(db_dir, name))
+
+
+def update_db(db, db_dir, filenames, jobs=1, engine='lines'):
+  """
+  Brings db['counts'] up to date with the given files, so that it holds
+  what --count over every file counted so far would give.
+  A file whose size and mtime are unchanged is skipped without reading
+  it; otherwise its contents are hashed, and only if they changed is it
+  counted again, after its old counts are taken back out of the totals.
+  Returns the list of files whose db entry changed.
+  """
+  if not os.path.exists(db_dir):
+    os.makedirs(db_dir)
+  counts = db['counts']
+  changed = []
+  for filename in filenames:
+    path = os.path.abspath(filename)
+    st = os.stat(filename)
+    known = db['files'].get(path)
+    if known and known[:2] == (st.st_size, st.st_mtime):
+      continue
+    digest = file_digest(filename)
+    changed.append(filename)
+    if known and known[2] == digest:
+      # Touched but not edited.
+      db['files'][path] = (st.st_size, st.st_mtime, digest)
+      continue
+    if known:
+      f = open(file_counts_path(db_dir, path, known[2]), 'rb')
+      old_count = marshal.load(f)
+      f.close()
+      for word, count in old_count.iteritems():
+        counts[word] -= count
+        if not counts[word]:
+          del counts[word]
+    word_count = count_files([filename], jobs, engine)
+    write_atomic(file_counts_path(db_dir, path, digest),
+                 marshal.dumps(word_count))
+    merge_counts(counts, word_count.iteritems())
+    db['files'][path] = (st.st_size, st.st_mtime, digest)
+  return changed
+
+
+def db_word_count(db_dir, filenames, jobs=1, engine='lines'):
+  """Counts only the new or changed files into the db in db_dir and
+  returns its totals."""
+  db = load_db(db_dir)
+  if update_db(db, db_dir, filenames, jobs, engine):
+    save_db(db_dir, db)
+  return db['counts']
+
+
+def reject_flags(mode, flags):
+  """Exits with a usage error naming the first (flag, given) pair that
+  was given, for flags that mode cannot honour."""
+  for flag, given in flags:
+    if given:
+      print '%s cannot be combined with %s' % (mode, flag)
+      sys.exit(1)
+
+
 # This basic command line argument parsing code is provided and
 # calls the print_words() and print_top() functions which you must define.
 def main():
-  if len(sys.argv) != 3:
-    print 'usage: ./wordcount.py {--count | --topcount} file'
+  if len(sys.argv) < 3:
+    print ('usage: ./wordcount.py {--count | --topcount} '
+           '[--jobs N | --engine lines|mmap] file [file ...]')
+    print '       ./wordcount.py --topcount --approx slots file [file ...]'
+    print ('       ./wordcount.py {--count | --topcount} --db dbdir '
+           '[file ...]')
+    print ('       ./wordcount.py {--count | --topcount} --ngrams N '
+           'file [file ...]')
+    print ('       ./wordcount.py --distinct [--precision P] [--jobs N] '
+           'file [file ...]')
+    print ('       ./wordcount.py --count --spill words [--tmpdir dir] '
+           'file [file ...]')
+    print '       ./wordcount.py --follow [--interval secs] [--top K] file'
+    print ('       ./wordcount.py --report --out count|top|distinct|total=file '
+           '[--out ...]')
+    print ('           [--jobs N | --engine lines|mmap] [--db dbdir] '
+           'file [file ...]')
     sys.exit(1)
 
   option = sys.argv[1]
-  filename = sys.argv[2]
-  if option == '--count':
-    print_words(filename)
-  elif option == '--topcount':
-    print_top(filename)
-  else:
+  args = sys.argv[2:]
+  jobs = 1
+  engine = 'lines'
+  approx = 0
+  db_filename = None
+  ngrams = 1
+  precision = 14
+  spill = 0
+  tmp_dir = None
+  interval = 2.0
+  top = 20
+  outputs = []
+  while args and args[0].startswith('--'):
+    if args[0] == '--jobs' and len(args) > 1:
+      jobs = int(args[1])
+      del args[0:2]
+    elif args[0] == '--engine' and len(args) > 1 and args[1] in ENGINES:
+      engine = args[1]
+      del args[0:2]
+    elif args[0] == '--approx' and len(args) > 1 and option == '--topcount':
+      approx = int(args[1])
+      del args[0:2]
+    elif args[0] == '--db' and len(args) > 1:
+      db_filename = args[1]
+      del args[0:2]
+    elif (args[0] == '--ngrams' and len(args) > 1 and args[1].isdigit() and
+          int(args[1]) > 0):
+      ngrams = int(args[1])
+      del args[0:2]
+    elif (args[0] == '--precision' and len(args) > 1 and args[1].isdigit() and
+          4 <= int(args[1]) <= 18):
+      precision = int(args[1])
+      del args[0:2]
+    elif args[0] == '--spill' and len(args) > 1 and option == '--count':
+      spill = int(args[1])
+      del args[0:2]
+    elif args[0] == '--tmpdir' and len(args) > 1:
+      tmp_dir = args[1]
+      del args[0:2]
+    elif args[0] == '--interval' and len(args) > 1:
+      interval = float(args[1])
+      del args[0:2]
+    elif (args[0] == '--top' and len(args) > 1 and args[1].isdigit() and
+          int(args[1]) > 0):
+      top = int(args[1])
+      del args[0:2]
+    elif (args[0] == '--out' and len(args) > 1 and
+          args[1].split('=', 1)[0] in REPORTS and '=' in args[1]):
+      outputs.append(tuple(args[1].split('=', 1)))
+      del args[0:2]
+    else:
+      print 'unknown option: ' + args[0]
+      sys.exit(1)
+  filenames = args
+  if not filenames and not db_filename:
+    print 'no input files'
+    sys.exit(1)
+
+  if option not in ('--count', '--topcount', '--distinct', '--follow',
+                    '--report'):
     print 'unknown option: ' + option
     sys.exit(1)
 
+  if option == '--report':
+    if not outputs:
+      print '--report needs at least one --out kind=file'
+      sys.exit(1)
+    reject_flags('--report', [('--ngrams', ngrams > 1)])
+    if db_filename:
+      word_count = db_word_count(db_filename, filenames, jobs, engine)
+    else:
+      word_count = count_files(filenames, jobs, engine)
+    write_reports(word_count, outputs)
+    return
+
+  if option == '--follow':
+    if len(filenames) != 1:
+      print '--follow takes exactly one file'
+      sys.exit(1)
+    reject_flags('--follow', [('--db', db_filename), ('--jobs', jobs > 1),
+                              ('--engine', engine != 'lines'),
+                              ('--ngrams', ngrams > 1)])
+    follow(filenames[0], interval, top)
+    return
+
+  if option == '--distinct':
+    reject_flags('--distinct', [('--db', db_filename),
+                                ('--engine', engine != 'lines'),
+                                ('--ngrams', ngrams > 1)])
+    print int(round(distinct_sketch(filenames, precision, jobs).estimate()))
+    return
+
+  if spill:
+    reject_flags('--spill', [('--db', db_filename), ('--jobs', jobs > 1),
+                             ('--engine', engine != 'lines'),
+                             ('--ngrams', ngrams > 1)])
+    print_words_external(filenames, spill, tmp_dir)
+    return
+
+  if approx:
+    reject_flags('--approx', [('--db', db_filename), ('--jobs', jobs > 1),
+                              ('--engine', engine != 'lines'),
+                              ('--ngrams', ngrams > 1)])
+    sketch = approx_top(filenames, approx)
+    for word, count in sketch.top(20):
+      print word, count
+    return
+
+  if ngrams > 1:
+    reject_flags('--ngrams', [('--db', db_filename), ('--jobs', jobs > 1),
+                              ('--engine', engine != 'lines')])
+    counts, words = ngram_counts(filenames, ngrams)
+    print_ngrams(counts, words, ngrams, option == '--topcount')
+    return
+
+  if db_filename:
+    # Count only new or changed files, then report from the stored totals.
+    word_count = db_word_count(db_filename, filenames, jobs, engine)
+    if option == '--count':
+      print_words(None, word_count)
+    else:
+      print_top(None, word_count)
+    return
+
+  word_count = None
+  if len(filenames) > 1 or jobs > 1 or engine != 'lines':
+    word_count = count_files(filenames, jobs, engine)
+  if option == '--count':
+    print_words(filenames[0], word_count)
+  else:
+    print_top(filenames[0], word_count)
+
 if __name__ == '__main__':
   main()
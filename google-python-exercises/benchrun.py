@@ -0,0 +1,39 @@
+#!/usr/bin/python -tt
+
+"""Runs one benchmark job at a time in a fresh worker process.
+
+Shared by babynames/solution/bench_babynames.py and
+basic/solution/bench_wordcount.py. ru_maxrss only ever grows within a
+process, so a job run in the benchmark's own process would report the
+peak of every job before it; a one-worker pool per job keeps each
+figure to that job alone.
+"""
+
+import cProfile
+import multiprocessing
+import resource
+
+
+def _run_job(job):
+  """Pool worker: calls function(*args), under cProfile if profile_file
+  is set. Returns (result, peak RSS in KB)."""
+  function, args, profile_file = job
+  if profile_file:
+    profiler = cProfile.Profile()
+    result = profiler.runcall(function, *args)
+    profiler.dump_stats(profile_file)
+  else:
+    result = function(*args)
+  return result, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_isolated(function, args=(), profile_file=None):
+  """Calls function(*args) in a new process and returns
+  (result, peak RSS of that process in KB). function must be defined at
+  module level so the pool can pickle it. With profile_file, a cProfile
+  dump of the call is written there."""
+  pool = multiprocessing.Pool(1)
+  try:
+    return pool.apply(_run_job, [(function, tuple(args), profile_file)])
+  finally:
+    pool.terminate()
@@ -11,6 +11,12 @@ import re
 import sys
 import urllib
 
+# zinput.py (transparent .gz/.bz2/.xz reading) lives at the top of the
+# exercises tree, shared with wordcount.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..'))
+import zinput
+
 """Logpuzzle exercise
 Given an apache logfile, find the puzzle urls and download the images.
 
@@ -36,13 +42,14 @@ def read_urls(filename):
   # +++your code here+++
   # LAB(begin solution)
   # Extract the hostname from the filename
+  # (without any .gz/.bz2/.xz ending -- compressed logs are read as is)
   underbar = filename.index('_')
-  host = filename[underbar + 1:]
+  host = zinput.base_name(filename[underbar + 1:])
 
   # Store the ulrs into a dict to screen out the duplicates
   url_dict = {}
 
-  f = open(filename)
+  f = zinput.open_input(filename)
   for line in f:
     # Find the path which is after the GET and surrounded by spaces.
     match = re.search(r'"GET (\S+)', line)
@@ -0,0 +1,129 @@
+#!/usr/bin/python -tt
+
+import bz2
+import gzip
+import itertools
+import os
+import shutil
+import tempfile
+import unittest
+
+import zinput
+
+FIRST = ''.join('line %d of the first stream\n' % i for i in range(3000))
+SECOND = ''.join('and line %d of the second\n' % i for i in range(2000))
+
+
+class TestZinput(unittest.TestCase):
+
+  def setUp(self):
+    self.dirname = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.dirname)
+
+  def write(self, name, data):
+    filename = os.path.join(self.dirname, name)
+    f = open(filename, 'wb')
+    f.write(data)
+    f.close()
+    return filename
+
+  def write_gzip(self, name, *texts):
+    """Writes each text as its own gzip member, back to back."""
+    filename = os.path.join(self.dirname, name)
+    f = open(filename, 'wb')
+    for text in texts:
+      member = gzip.GzipFile(fileobj=f, mode='wb')
+      member.write(text)
+      member.close()
+    f.close()
+    return filename
+
+  def read_all(self, filename):
+    f = zinput.open_input(filename)
+    lines = list(f)
+    f.close()
+    return ''.join(lines)
+
+  def test_plain_file(self):
+    filename = self.write('plain.txt', FIRST + 'no newline at the end')
+    self.assertEqual(None, zinput.detect(filename))
+    self.assertEqual(FIRST + 'no newline at the end', self.read_all(filename))
+
+  def test_detect_and_base_name(self):
+    self.assertEqual('gzip', zinput.detect(self.write_gzip('a.gz', FIRST)))
+    self.assertEqual('bz2',
+                     zinput.detect(self.write('a.bz2', bz2.compress(FIRST))))
+    self.assertEqual('access.log', zinput.base_name('access.log.gz'))
+    self.assertEqual('access.log', zinput.base_name('access.log'))
+
+  def test_concatenated_gzip(self):
+    filename = self.write_gzip('two.gz', FIRST, SECOND)
+    self.assertEqual(FIRST + SECOND, self.read_all(filename))
+
+  def test_concatenated_bz2(self):
+    filename = self.write('two.bz2', bz2.compress(FIRST) + bz2.compress(SECOND))
+    self.assertEqual(FIRST + SECOND, self.read_all(filename))
+
+  def test_stream_ends_on_block_boundary(self):
+    # Each read hands the decompressor exactly one whole stream, so it
+    # has no unused data when its stream ends; bz2 then raises EOFError
+    # on the next stream's data.
+    first = bz2.compress(FIRST)
+    filename = self.write('two.bz2', first + bz2.compress(FIRST))
+    blocks = zinput.decompressed_blocks(filename, 'bz2', len(first))
+    self.assertEqual(FIRST + FIRST, ''.join(blocks))
+
+    first = open(self.write_gzip('one.gz', FIRST), 'rb').read()
+    filename = self.write_gzip('two.gz', FIRST, FIRST)
+    blocks = zinput.decompressed_blocks(filename, 'gzip', len(first))
+    self.assertEqual(FIRST + FIRST, ''.join(blocks))
+
+  def test_no_trailing_newline(self):
+    filename = self.write_gzip('tail.gz', FIRST, 'last words')
+    self.assertEqual(FIRST + 'last words', self.read_all(filename))
+
+  def test_read_after_lines(self):
+    filename = self.write_gzip('two.gz', FIRST, SECOND)
+    f = zinput.open_input(filename)
+    lines = list(itertools.islice(f, 10))
+    rest = f.read()
+    f.close()
+    self.assertEqual(FIRST + SECOND, ''.join(lines) + rest)
+
+  def test_close_before_eof(self):
+    filename = self.write_gzip('big.gz', FIRST * 200)
+    f = zinput.open_input(filename)
+    self.assertEqual('line 0 of the first stream\n', iter(f).next())
+    f.close()
+    self.assertFalse(f.blocks.thread.is_alive())
+
+  def test_threaded_blocks_close(self):
+    closed = []
+
+    def endless():
+      try:
+        while True:
+          yield 'block'
+      finally:
+        closed.append(True)
+
+    blocks = zinput.ThreadedBlocks(endless(), depth=1)
+    self.assertEqual('block', iter(blocks).next())
+    blocks.close()
+    self.assertFalse(blocks.thread.is_alive())
+    self.assertEqual([True], closed)
+
+  def test_threaded_blocks_error(self):
+
+    def failing():
+      yield 'block'
+      raise IOError('disk on fire')
+
+    blocks = zinput.ThreadedBlocks(failing())
+    self.assertRaises(IOError, list, blocks)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,211 @@
+#!/usr/bin/python -tt
+
+"""Transparent input layer for plain, gzip, bzip2 and xz files.
+
+open_input(filename) looks at the first bytes of the file, not its name,
+to pick a decompressor. A plain file comes back as an ordinary file
+object; a compressed one comes back as an iterable of lines whose data is
+decompressed in large blocks by a background thread, so decompression
+overlaps with whatever the caller does with each line. (zlib and bz2
+release the GIL while they work, so the two really do run side by side.)
+
+Shared by basic/solution/wordcount.py and logpuzzle/solution/logpuzzle.py.
+xz needs an lzma module, which Python 2 does not ship: install
+backports.lzma.
+"""
+
+import bz2
+import cStringIO
+import Queue
+import threading
+import zlib
+
+try:
+  import lzma
+except ImportError:
+  try:
+    from backports import lzma
+  except ImportError:
+    lzma = None
+
+# Compressed bytes read per block, and how many decompressed blocks the
+# reader thread may get ahead of the consumer.
+BLOCK_SIZE = 1 << 20
+QUEUE_BLOCKS = 4
+
+MAGIC = [
+    ('\x1f\x8b', 'gzip'),
+    ('BZh', 'bz2'),
+    ('\xfd7zXZ\x00', 'xz'),
+]
+
+# File name endings dropped by base_name().
+SUFFIXES = ('.gz', '.bz2', '.xz')
+
+
+def detect(filename):
+  """Returns 'gzip', 'bz2' or 'xz' from the file's magic bytes, or None."""
+  f = open(filename, 'rb')
+  head = f.read(6)
+  f.close()
+  for magic, kind in MAGIC:
+    if head.startswith(magic):
+      return kind
+  return None
+
+
+def base_name(filename):
+  """Returns filename without a .gz/.bz2/.xz ending."""
+  for suffix in SUFFIXES:
+    if filename.endswith(suffix):
+      return filename[:-len(suffix)]
+  return filename
+
+
+def new_decompressor(kind):
+  if kind == 'gzip':
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+  if kind == 'bz2':
+    return bz2.BZ2Decompressor()
+  if lzma is None:
+    raise IOError('reading xz files needs the lzma module')
+  return lzma.LZMADecompressor()
+
+
+def decompressed_blocks(filename, kind, block_size=BLOCK_SIZE):
+  """Yields the decompressed data of the file a block at a time.
+  Handles files made of several concatenated compressed streams."""
+  f = open(filename, 'rb')
+  decompressor = new_decompressor(kind)
+  try:
+    while True:
+      data = f.read(block_size)
+      if not data:
+        break
+      while data:
+        try:
+          block = decompressor.decompress(data)
+        except EOFError:
+          # bz2 refuses more data once its stream is over, which happens
+          # when a stream ends exactly on a block boundary: the data is
+          # the next stream.
+          decompressor = new_decompressor(kind)
+          continue
+        if block:
+          yield block
+        data = decompressor.unused_data
+        if data:
+          decompressor = new_decompressor(kind)
+  finally:
+    f.close()
+
+
+class ThreadedBlocks(object):
+  """
+  Runs the blocks generator in a background thread; iterating yields
+  what it produces. Errors in the thread are re-raised in the caller.
+  close() stops the thread and closes the generator (and so its file)
+  even if the caller stopped reading part way through.
+  """
+
+  def __init__(self, blocks, depth=QUEUE_BLOCKS):
+    self.blocks = blocks
+    self.queue = Queue.Queue(depth)
+    self.done = object()
+    self.stop = threading.Event()
+    self.thread = threading.Thread(target=self.produce)
+    # A daemon, so a caller that never calls close() doesn't hang exit.
+    self.thread.daemon = True
+    self.thread.start()
+
+  def produce(self):
+    try:
+      try:
+        for block in self.blocks:
+          if self.stop.is_set():
+            return
+          self.queue.put(block)
+      except Exception, e:
+        self.queue.put(e)
+        return
+      self.queue.put(self.done)
+    finally:
+      # Generators can only be closed by the thread running them.
+      self.blocks.close()
+
+  def __iter__(self):
+    while True:
+      item = self.queue.get()
+      if item is self.done:
+        break
+      if isinstance(item, Exception):
+        raise item
+      yield item
+
+  def close(self):
+    self.stop.set()
+    # Empty the queue, so a put() the thread is blocked in can finish and
+    # the thread gets back round to checking stop. It puts at most one
+    # more item, which there is now room for.
+    while self.thread.is_alive():
+      try:
+        self.queue.get(timeout=0.1)
+      except Queue.Empty:
+        pass
+
+
+class CompressedInput(object):
+  """
+  Line-iterable, read()-able view of a decompressed file.
+  Both share one cursor -- the decompressed data not yet handed out and
+  the position in it -- so read() after some lines returns the rest.
+  """
+
+  def __init__(self, filename, kind):
+    if kind == 'xz' and lzma is None:
+      raise IOError('reading xz files needs the lzma module')
+    self.blocks = ThreadedBlocks(decompressed_blocks(filename, kind))
+    self.block_iter = iter(self.blocks)
+    self.data = ''
+    self.pos = 0
+
+  def fill(self):
+    """Adds the next block to the unread data; returns False at the end."""
+    for block in self.block_iter:
+      self.data = self.data[self.pos:] + block
+      self.pos = 0
+      return True
+    return False
+
+  def __iter__(self):
+    while True:
+      cut = self.data.rfind('\n') + 1
+      if cut > self.pos:
+        # cStringIO splits on '\n' only, the same as iterating a file.
+        for line in cStringIO.StringIO(self.data[self.pos:cut]):
+          self.pos += len(line)
+          yield line
+      elif not self.fill():
+        if self.pos < len(self.data):
+          line = self.data[self.pos:]
+          self.pos = len(self.data)
+          yield line
+        return
+
+  def read(self):
+    rest = [self.data[self.pos:]]
+    rest.extend(self.block_iter)
+    self.data = ''
+    self.pos = 0
+    return ''.join(rest)
+
+  def close(self):
+    self.blocks.close()
+
+
+def open_input(filename, mode='r'):
+  """Opens filename for reading, decompressing it if need be."""
+  kind = detect(filename)
+  if kind is None:
+    return open(filename, mode)
+  return CompressedInput(filename, kind)